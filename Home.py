@@ -5,11 +5,10 @@ Elegant overview dashboard with key metrics from all domains
 
 import streamlit as st
 import pandas as pd
-import plotly.express as px
 import plotly.graph_objects as go
 from datetime import datetime, timedelta
-from core_analysis.data_retriever import DataRetriever
-from core_analysis.ai_engine import AIEngine
+from core_analysis.data_retriever import get_data_retriever
+from core_analysis.fastprep import trend_arrays, warm_kernels
 
 # Page configuration
 st.set_page_config(
@@ -20,8 +19,7 @@ st.set_page_config(
 )
 
 # Custom CSS - Elegant and Minimal Design
-st.markdown("""
-<style>
+CUSTOM_CSS = """
     /* Main background */
     .main {
         background-color: #f8f9fa;
@@ -146,14 +144,16 @@ st.markdown("""
         height: 2px;
         background: linear-gradient(90deg, transparent, #e2e8f0, transparent);
     }
-</style>
-""", unsafe_allow_html=True)
+"""
+
+@st.cache_data(show_spinner=False)
+def build_style_block():
+    """Wrap the page CSS in a <style> tag once per process"""
+    return f"<style>{CUSTOM_CSS}</style>"
+
+st.markdown(build_style_block(), unsafe_allow_html=True)
 
 # Initialize session state
-if 'data_retriever' not in st.session_state:
-    st.session_state.data_retriever = None
-if 'ai_engine' not in st.session_state:
-    st.session_state.ai_engine = AIEngine()
 if 'data_loaded' not in st.session_state:
     st.session_state.data_loaded = False
 if 'home_data' not in st.session_state:
@@ -162,13 +162,39 @@ if 'home_data' not in st.session_state:
 def initialize_connections():
     """Initialize database connections"""
     try:
-        if st.session_state.data_retriever is None:
-            st.session_state.data_retriever = DataRetriever()
+        get_data_retriever()
         return True
     except Exception as e:
         st.error(f"Failed to connect to database: {str(e)}")
         return False
 
+# Maximum points shipped to the browser per trend trace
+MAX_CHART_POINTS = 500
+
+@st.cache_resource(show_spinner=False)
+def warm_chart_kernels():
+    """Compile the chart prep kernels once per process, before the first refresh"""
+    return warm_kernels()
+
+warm_chart_kernels()
+
+@st.cache_data(ttl=300, show_spinner=False)
+def load_home_data(_data_retriever, start_date, end_date):
+    """
+    Aggregate the Home KPIs in MongoDB for a date range (cached per range)
+    and extract every chart's (x, y) arrays once in a single prep pass
+    """
+    results = _data_retriever.get_home_kpis(start_date, end_date)
+    top_products = results['sales']['top_products']
+    top_5 = top_products.head(5) if top_products is not None else None
+    chart_arrays = {
+        'revenue': trend_arrays(results['sales']['revenue_trend'], 'Date', 'Revenue', MAX_CHART_POINTS),
+        'defect': trend_arrays(results['quality']['defect_trend'], 'Date', 'Defect_Rate', MAX_CHART_POINTS),
+        'inventory': trend_arrays(results['inventory']['inventory_trend'], 'Date', 'Inventory_Level', MAX_CHART_POINTS),
+        'top_products': trend_arrays(top_5, 'SKU', 'Revenue')
+    }
+    return results, chart_arrays
+
 def create_kpi_card(label, value, format_type="number", delta=None):
     """Create a styled KPI metric card"""
     if format_type == "currency":
@@ -178,12 +204,50 @@ def create_kpi_card(label, value, format_type="number", delta=None):
     else:
         st.metric(label, f"{value:,.0f}", delta=delta)
 
-# Main content
-st.title("📊 Business Intelligence Dashboard")
-st.markdown("##### Real-time insights across all business domains")
+# Shared layout for the overview charts
+CHART_LAYOUT = dict(
+    template='plotly_white',
+    height=350,
+    margin=dict(l=10, r=10, t=30, b=10),
+    showlegend=False,
+    plot_bgcolor='rgba(0,0,0,0)',
+    paper_bgcolor='rgba(0,0,0,0)'
+)
 
-# Sidebar - Date Range Filter
-with st.sidebar:
+def trend_chart(x, y, color, yaxis_title, fill=None):
+    """Build a WebGL line/area trend figure from pre-extracted arrays"""
+    fig = go.Figure(go.Scattergl(x=x, y=y, mode='lines', fill=fill, line=dict(color=color)))
+    fig.update_layout(**CHART_LAYOUT, xaxis_title="", yaxis_title=yaxis_title, hovermode='x unified')
+    fig.update_xaxes(showgrid=False)
+    fig.update_yaxes(showgrid=True, gridcolor='rgba(0,0,0,0.05)')
+    return fig
+
+def bar_chart(x, y, color, xaxis_title="", yaxis_title="", orientation='v'):
+    """Build a bar figure from pre-extracted arrays (no hover labels, for small categorical bars)"""
+    fig = go.Figure(go.Bar(x=x, y=y, orientation=orientation, marker_color=color, hoverinfo='skip'))
+    fig.update_layout(**CHART_LAYOUT, xaxis_title=xaxis_title, yaxis_title=yaxis_title, hovermode=False)
+    fig.update_xaxes(showgrid=orientation == 'h', gridcolor='rgba(0,0,0,0.05)')
+    fig.update_yaxes(showgrid=orientation != 'h', gridcolor='rgba(0,0,0,0.05)')
+    return fig
+
+@st.cache_data(ttl=300, show_spinner=False)
+def build_chart(chart_name, x, y):
+    """Build one overview figure (cached on its data, so it always matches the loaded KPIs)"""
+    if chart_name == 'revenue':
+        return trend_chart(x, y, '#667eea', "Revenue ($)", fill='tozeroy')
+    if chart_name == 'defect':
+        fig = trend_chart(x, y, '#f59e0b', "Defect Rate (%)")
+        fig.add_hline(y=5, line_dash="dash", line_color="red", opacity=0.4, annotation_text="Threshold")
+        return fig
+    if chart_name == 'inventory':
+        # One point per day: a filled WebGL line instead of one SVG rect per bar
+        return trend_chart(x, y, '#10b981', "Inventory Level", fill='tozeroy')
+    # Top products: revenue on x, SKUs on y
+    return bar_chart(y, x, '#8b5cf6', xaxis_title="Revenue ($)", orientation='h')
+
+@st.fragment
+def render_sidebar():
+    """Date range filter and refresh controls (reruns on its own)"""
     st.markdown("## 📅 Date Range")
     date_range = st.date_input(
         "Select Period",
@@ -203,13 +267,16 @@ with st.sidebar:
                         end_date = datetime.now()
                         start_date = end_date - timedelta(days=30)
                     
-                    # Fetch all data
-                    data_dict = st.session_state.data_retriever.get_all_data(start_date, end_date)
-                    results = st.session_state.ai_engine.run_all_analyses(data_dict)
+                    # Aggregate KPIs server-side (served from cache when the range is unchanged)
+                    results, chart_arrays = load_home_data(
+                        get_data_retriever(),
+                        start_date,
+                        end_date
+                    )
                     
                     st.session_state.home_data = {
-                        'data_dict': data_dict,
                         'results': results,
+                        'trend_arrays': chart_arrays,
                         'start_date': start_date,
                         'end_date': end_date
                     }
@@ -228,12 +295,9 @@ with st.sidebar:
     st.markdown("- 📦 **Inventory** - Stock & Alerts")
     st.markdown("- 🤖 **AI Assistant** - Ask Questions")
 
-# Main Dashboard
-if st.session_state.data_loaded and st.session_state.home_data:
-    data_dict = st.session_state.home_data['data_dict']
-    results = st.session_state.home_data['results']
-    
-    # KPI Row
+@st.fragment
+def render_kpis(results):
+    """KPI metric row"""
     st.markdown("### 📈 Key Performance Indicators")
     kpi_cols = st.columns(4)
     
@@ -248,122 +312,85 @@ if st.session_state.data_loaded and st.session_state.home_data:
     
     with kpi_cols[3]:
         create_kpi_card("Test Pass Rate", results['testing']['pass_rate'], "percent")
+
+@st.fragment
+def render_sales_trend(x, y):
+    """Sales revenue area chart"""
+    st.markdown("#### 💰 Sales Revenue Trend")
+    if x.size:
+        st.plotly_chart(build_chart('revenue', x, y), use_container_width=True)
+    else:
+        st.info("No sales data available for the selected period")
+
+@st.fragment
+def render_defect_trend(x, y):
+    """Quality defect rate line chart"""
+    st.markdown("#### 🔧 Quality Defect Rate")
+    if x.size:
+        st.plotly_chart(build_chart('defect', x, y), use_container_width=True)
+    else:
+        st.info("No quality data available for the selected period")
+
+@st.fragment
+def render_inventory_trend(x, y):
+    """Inventory level area chart"""
+    st.markdown("#### 📦 Inventory Levels")
+    if x.size:
+        st.plotly_chart(build_chart('inventory', x, y), use_container_width=True)
+    else:
+        st.info("No inventory data available for the selected period")
+
+@st.fragment
+def render_top_products(skus, revenue):
+    """Top products horizontal bar chart"""
+    st.markdown("#### 🧪 Top Products by Revenue")
+    if skus.size:
+        st.plotly_chart(build_chart('top_products', skus, revenue), use_container_width=True)
+    else:
+        st.info("No product data available for the selected period")
+
+# Overview views: label -> (renderer, chart_arrays key)
+DOMAIN_VIEWS = {
+    "💰 Sales": (render_sales_trend, 'revenue'),
+    "🔧 Quality": (render_defect_trend, 'defect'),
+    "📦 Inventory": (render_inventory_trend, 'inventory'),
+    "🧪 Top Products": (render_top_products, 'top_products')
+}
+
+@st.fragment
+def render_domain_overview(chart_arrays):
+    """Chart selector that builds only the active view (switching reruns just this fragment)"""
+    view = st.radio(
+        "Domain",
+        list(DOMAIN_VIEWS),
+        horizontal=True,
+        label_visibility="collapsed",
+        key="home_overview_view"
+    )
+    renderer, arrays_key = DOMAIN_VIEWS[view]
+    renderer(*chart_arrays[arrays_key])
+
+# Main content
+st.title("📊 Business Intelligence Dashboard")
+st.markdown("##### Real-time insights across all business domains")
+
+# Sidebar - Date Range Filter
+with st.sidebar:
+    render_sidebar()
+
+# Main Dashboard
+if st.session_state.data_loaded and st.session_state.home_data:
+    results = st.session_state.home_data['results']
+    chart_arrays = st.session_state.home_data['trend_arrays']
+    
+    # KPI Row
+    render_kpis(results)
     
     st.markdown("---")
     
-    # Charts Grid
+    # Domain charts (only the selected view is built)
     st.markdown("### 📊 Domain Overview")
-    
-    col1, col2 = st.columns(2)
-    
-    with col1:
-        st.markdown("#### 💰 Sales Revenue Trend")
-        if not results['sales']['revenue_trend'].empty:
-            fig = px.area(
-                results['sales']['revenue_trend'],
-                x='Date',
-                y='Revenue',
-                color_discrete_sequence=['#667eea'],
-                template='plotly_white'
-            )
-            fig.update_layout(
-                height=350,
-                margin=dict(l=10, r=10, t=30, b=10),
-                showlegend=False,
-                xaxis_title="",
-                yaxis_title="Revenue ($)",
-                hovermode='x unified',
-                plot_bgcolor='rgba(0,0,0,0)',
-                paper_bgcolor='rgba(0,0,0,0)'
-            )
-            fig.update_xaxes(showgrid=False)
-            fig.update_yaxes(showgrid=True, gridcolor='rgba(0,0,0,0.05)')
-            st.plotly_chart(fig, use_container_width=True)
-        else:
-            st.info("No sales data available for the selected period")
-    
-    with col2:
-        st.markdown("#### 🔧 Quality Defect Rate")
-        if not results['quality']['defect_trend'].empty:
-            fig = px.line(
-                results['quality']['defect_trend'],
-                x='Date',
-                y='Defect_Rate',
-                color_discrete_sequence=['#f59e0b'],
-                template='plotly_white'
-            )
-            fig.update_layout(
-                height=350,
-                margin=dict(l=10, r=10, t=30, b=10),
-                showlegend=False,
-                xaxis_title="",
-                yaxis_title="Defect Rate (%)",
-                hovermode='x unified',
-                plot_bgcolor='rgba(0,0,0,0)',
-                paper_bgcolor='rgba(0,0,0,0)'
-            )
-            fig.add_hline(y=5, line_dash="dash", line_color="red", opacity=0.4, annotation_text="Threshold")
-            fig.update_xaxes(showgrid=False)
-            fig.update_yaxes(showgrid=True, gridcolor='rgba(0,0,0,0.05)')
-            st.plotly_chart(fig, use_container_width=True)
-        else:
-            st.info("No quality data available for the selected period")
-    
-    col3, col4 = st.columns(2)
-    
-    with col3:
-        st.markdown("#### 📦 Inventory Levels")
-        if not results['inventory']['inventory_trend'].empty:
-            fig = px.bar(
-                results['inventory']['inventory_trend'],
-                x='Date',
-                y='Inventory_Level',
-                color_discrete_sequence=['#10b981'],
-                template='plotly_white'
-            )
-            fig.update_layout(
-                height=350,
-                margin=dict(l=10, r=10, t=30, b=10),
-                showlegend=False,
-                xaxis_title="",
-                yaxis_title="Inventory Level",
-                hovermode='x unified',
-                plot_bgcolor='rgba(0,0,0,0)',
-                paper_bgcolor='rgba(0,0,0,0)'
-            )
-            fig.update_xaxes(showgrid=False)
-            fig.update_yaxes(showgrid=True, gridcolor='rgba(0,0,0,0.05)')
-            st.plotly_chart(fig, use_container_width=True)
-        else:
-            st.info("No inventory data available for the selected period")
-    
-    with col4:
-        st.markdown("#### 🧪 Top Products by Revenue")
-        if not results['sales']['top_products'].empty:
-            top_5 = results['sales']['top_products'].head(5)
-            fig = px.bar(
-                top_5,
-                x='Revenue',
-                y='SKU',
-                orientation='h',
-                color_discrete_sequence=['#8b5cf6'],
-                template='plotly_white'
-            )
-            fig.update_layout(
-                height=350,
-                margin=dict(l=10, r=10, t=30, b=10),
-                showlegend=False,
-                xaxis_title="Revenue ($)",
-                yaxis_title="",
-                hovermode='y unified',
-                plot_bgcolor='rgba(0,0,0,0)',
-                paper_bgcolor='rgba(0,0,0,0)'
-            )
-            fig.update_xaxes(showgrid=True, gridcolor='rgba(0,0,0,0.05)')
-            fig.update_yaxes(showgrid=False)
-            st.plotly_chart(fig, use_container_width=True)
-        else:
-            st.info("No product data available for the selected period")
+    render_domain_overview(chart_arrays)
     
     # Additional Insights
     st.markdown("---")
@@ -6,13 +6,20 @@ Contains corrected analysis logic using properly mapped MongoDB schema
 
 import pandas as pd
 import numpy as np
-from datetime import datetime, timedelta
+import hashlib
 import json
 import re
+import textwrap
 import streamlit as st
-import plotly.express as px
-import plotly.graph_objects as go
 import os
+import random
+import threading
+import time
+import weakref
+from collections import OrderedDict
+from functools import lru_cache
+from core_analysis.data_retriever import PROFIT_MARGIN
+from core_analysis.fastprep import daily_sums, group_codes, group_means, group_sums, quality_reduce, safe_ratio, status_count, top_k_indices
 
 # --- JSON SCHEMA DEFINITION FOR GEMINI OUTPUT ---
 # This dictionary defines the strict structure the model MUST follow.
@@ -44,15 +51,211 @@ RESPONSE_SCHEMA = {
 }
 # ----------------------------------------------------
 
+# String key columns grouped/filtered on: stored as category so groupbys hash small integer codes
+CATEGORICAL_COLUMNS = ('SKU', 'Line_ID', 'Store_ID', 'domain')
+
+
+def _coerce_categoricals(df):
+    """Convert the key columns present in df to category dtype in place (no-op when already converted)"""
+    for col in CATEGORICAL_COLUMNS:
+        if col in df.columns and not isinstance(df[col].dtype, pd.CategoricalDtype):
+            df[col] = df[col].astype('category')
+    return df
+
+
+# Gemini analysis_type -> chat handler domain (the schema's own tokens resolve directly)
+ANALYSIS_DOMAINS = {'sales': 'sales', 'manufacturing': 'manufacturing', 'testing': 'testing',
+                    'inventory': 'inventory', 'field': 'inventory'}
+
+# Fallback keywords for free-form analysis types, checked in order
+ANALYSIS_KEYWORDS = (
+    ('sales', 'sales'), ('revenue', 'sales'),
+    ('manufacturing', 'manufacturing'), ('quality', 'manufacturing'),
+    ('testing', 'testing'),
+    ('field', 'inventory'), ('inventory', 'inventory')
+)
+
+
+@lru_cache(maxsize=64)
+def _analysis_domain(analysis_type):
+    """Resolve a Gemini analysis_type to a handler domain (memoized per distinct string)"""
+    token = analysis_type.strip().lower()
+    if token in ANALYSIS_DOMAINS:
+        return ANALYSIS_DOMAINS[token]
+    return next((domain for keyword, domain in ANALYSIS_KEYWORDS if keyword in token), None)
+
+
+def _literal_tokens(question, key_values=frozenset()):
+    """
+    Tokens of a normalized question that pin its intent
+
+    Anything with a digit, time-range, chart and domain words, and the
+    loaded data's key values (SKU, line and store names, possibly several
+    words long) that the question mentions.
+    """
+    tokens = re.findall(r'[\w-]+', question)
+    padded = f" {' '.join(tokens)} "
+    literals = [token for token in tokens if token in _LITERAL_WORDS or any(ch.isdigit() for ch in token)]
+    literals.extend(value for value in key_values if f' {value} ' in padded)
+    return frozenset(literals)
+
+
+# The only per-request prompt text; everything static is in the system instruction
+USER_PROMPT_TEMPLATE = 'User Question: "{question}"'
+
+# Upper bound on a single Gemini round trip, so a stalled call cannot hang the chat
+GEMINI_TIMEOUT_SECONDS = 30
+
+# Rate-limited (429) or transiently failing (500/503) Gemini calls are retried this
+# many times with exponential backoff
+GEMINI_MAX_RETRIES = 3
+
+# Answered chat queries kept per process (least recently used evicted first)
+QUERY_CACHE_SIZE = 256
+
+# Gemini intents reused for near-duplicate questions: embedding model, cosine
+# similarity needed for a match, and entries kept (oldest evicted first)
+EMBEDDING_MODEL = 'models/text-embedding-004'
+LOCAL_EMBEDDING_MODEL = 'all-MiniLM-L6-v2'
+INTENT_SIMILARITY_THRESHOLD = 0.92
+INTENT_CACHE_SIZE = 512
+
+# Words that change a query's filters, chart or domain while barely moving its embedding
+_LITERAL_WORDS = frozenset((
+    # time ranges
+    'today', 'yesterday', 'day', 'days', 'week', 'weeks', 'month', 'months',
+    'quarter', 'year', 'years', 'this', 'last', 'past', 'all',
+    # chart types
+    'pie', 'donut', 'bar', 'bars', 'column', 'line', 'trend', 'trends', 'daily', 'top',
+    # domains
+    'profit', 'profits', 'defect', 'defects', 'test', 'tests', 'pass', 'passed', 'fail', 'failed',
+    'failure', 'failures', 'stock', 'stocks'
+)) | frozenset(ANALYSIS_DOMAINS) | frozenset(keyword for keyword, _ in ANALYSIS_KEYWORDS)
+
+# Key columns whose values, named in a question, pin its filters
+_KEY_VALUE_COLUMNS = ('SKU', 'Line_ID', 'Store_ID')
+
+# Loaded datasets kept pre-indexed for chat filtering (one per distinct data load)
+FILTER_INDEX_CACHE_SIZE = 4
+
+# Loaded frame objects whose fingerprint is remembered (one per live session dataset)
+FINGERPRINT_CACHE_SIZE = 64
+
+# Distinct input frames remembered per analysis (filter combinations per session)
+ANALYSIS_CACHE_ENTRIES = 32
+
+# Analysis results remembered per input frame object (skips st.cache_data's content hash)
+ANALYSIS_MEMO_SIZE = 16
+
+# Results for inputs with no rows (or without the columns an analysis needs);
+# handed out as copies so callers never share a template
+_EMPTY_SALES = {'total_revenue': 0, 'total_profit': 0, 'profit_margin': 0, 'revenue_trend': None, 'top_products': None}
+_EMPTY_QUALITY = {'avg_defect_rate': 0, 'total_defects': 0, 'total_produced': 0, 'defect_trend': None, 'line_performance': None, 'anomalies': []}
+_EMPTY_INVENTORY = {'total_inventory': 0, 'low_stock_alerts': 0, 'avg_days_to_depletion': 0, 'critical_stores': None, 'inventory_trend': None}
+_EMPTY_TESTING = {'total_tests': 0, 'pass_rate': 0, 'failed_tests': 0}
+
+# Columns each dashboard analysis reads: only these are hashed by st.cache_data
+ANALYSIS_COLUMNS = {
+    'sales': ('Revenue', 'Profit', 'Quantity', 'SKU', 'timestamp'),
+    'quality': ('Quantity_Produced', 'Defects', 'Line_ID', 'timestamp'),
+    'inventory': ('Store_ID', 'Inventory_Level', 'Daily_Consumption', 'Low_Stock_Alerts', 'timestamp'),
+    'testing': ('Pass_Fail_Status',)
+}
+
+
+def _project(df, columns):
+    """
+    Select the present columns of df; df itself when none are present
+
+    The selection copies those columns (pandas only defers the copy under
+    copy-on-write), so the cost is one pass over the columns an analysis
+    reads rather than over the whole frame.
+    """
+    present = [col for col in columns if col in df.columns]
+    return df[present] if present else df
+
+
+# Nanoseconds per day, the unit of the indexed timestamps
+DAY_NS = 86_400 * 10**9
+
+# Fixed-length chat time ranges: phrase -> lookback in int64 nanoseconds
+TIME_RANGE_WINDOWS = {
+    'last 7 days': 7 * DAY_NS,
+    'last week': 7 * DAY_NS,
+    'last month': 30 * DAY_NS
+}
+
+# All recognised time-range phrases in one pass (any other phrase means the whole range)
+TIME_RANGE_PATTERN = re.compile(r'last 7 days|last week|last month|this week')
+
+# Keyword routing of obvious chat questions (see AIEngine._try_local_route): each named
+# group is a handler domain, and the visualization groups pick the chart type
+LOCAL_DOMAIN_PATTERN = re.compile(
+    r'\b(?:(?P<sales>revenue|sales|profits?)'
+    r'|(?P<manufacturing>defects?|quality|manufacturing)'
+    r'|(?P<testing>tests?|testing|pass(?:ed)?|fail(?:ed|ures?)?)'
+    r'|(?P<inventory>inventory|stocks?))\b'
+)
+LOCAL_VIZ_PATTERN = re.compile(
+    r'\b(?:(?P<line_chart>trends?|over time|daily|line (?:chart|graph))'
+    r'|(?P<pie_chart>pie)'
+    r'|(?P<bar_chart>charts?|graphs?|bars?|plots?|top|by (?:line|sku|store)|comparisons?|compare|performance))\b'
+)
+
+# Filler words a locally routed question may contain besides its domain, chart and time
+# range; any other word (a product name, "yesterday", "january", ...) may be a filter,
+# so the question goes to Gemini instead
+LOCAL_ROUTE_WORDS = frozenset((
+    'a', 'an', 'and', 'are', 'by', 'can', 'chart', 'display', 'for', 'give', 'graph', 'how',
+    'i', 'in', 'is', 'me', 'my', 'of', 'on', 'our', 'overall', 'please', 'plot', 'rate', 'see',
+    'show', 'the', 'to', 'total', 'visualize', 'was', 'what', 'with', 'you'
+))
+
+# Handler domain -> merged-frame 'domain' value a locally routed question is filtered to
+LOCAL_ROUTE_FILTERS = {'sales': 'Sales', 'manufacturing': 'Manufacturing', 'testing': 'Testing', 'inventory': 'Field'}
+
 # Try to import the official SDK (we assume the older one for structured output reliability)
 HAS_SDK = False
 try:
     # We rely on the older, more stable path for structured JSON output
     import google.generativeai as genai
+    from google.api_core import exceptions as google_exceptions
     HAS_SDK = True
 except Exception:
     HAS_SDK = False
 
+# Rate limits, and the errors worth retrying, matched by type (ResourceExhausted is a
+# TooManyRequests), never by message text: a "400 ... 50000 bytes" error must not look
+# like a 500, nor a prompt quoting "429" like a quota error
+GEMINI_RATE_LIMIT_ERRORS = (google_exceptions.TooManyRequests,) if HAS_SDK else ()
+GEMINI_TRANSIENT_ERRORS = GEMINI_RATE_LIMIT_ERRORS + (
+    (google_exceptions.InternalServerError, google_exceptions.ServiceUnavailable) if HAS_SDK else ()
+)
+
+# orjson is optional: a faster C parser for the model's JSON replies (its decode
+# error subclasses json.JSONDecodeError, so error handling is unchanged)
+HAS_ORJSON = False
+try:
+    import orjson
+    HAS_ORJSON = True
+except Exception:
+    HAS_ORJSON = False
+json_loads = orjson.loads if HAS_ORJSON else json.loads
+
+# Optional local sentence embeddings: question similarity without a network round trip
+HAS_SENTENCE_TRANSFORMERS = False
+try:
+    from sentence_transformers import SentenceTransformer
+    HAS_SENTENCE_TRANSFORMERS = True
+except Exception:
+    HAS_SENTENCE_TRANSFORMERS = False
+
+
+@st.cache_resource(show_spinner=False)
+def get_local_embedder():
+    """Process-wide local embedding model (loaded on first use)"""
+    return SentenceTransformer(LOCAL_EMBEDDING_MODEL)
+
 
 class AIEngine:
     """
@@ -63,6 +266,7 @@ class AIEngine:
     def __init__(self):
         self.api_key = None
         self.genai_client = None
+        self.chat_model = None
         
         # 1. Try Streamlit Secrets (most common for deployed apps)
         try:
@@ -95,6 +299,34 @@ class AIEngine:
             except ImportError:
                 pass
         
+        # Define the data schema for Gemini (dedented: it rides along in the system
+        # instruction of every request, so source indentation would be paid in tokens)
+        self.data_schema = textwrap.dedent("""
+        MongoDB Data Schema (The system is analyzing a Pandas DataFrame merged from these four collections):
+        1. Sales: Bill_ID, Revenue, Profit, Quantity, SKU, timestamp (Use 'sales' for analysis_type)
+        2. Manufacturing: Batch_ID, Quantity_Produced, Defects, Defect_Rate, Line_ID, SKU, timestamp (Use 'manufacturing' for analysis_type)
+        3. Testing: Test_ID, Batch_ID, Pass_Fail_Status, timestamp (Use 'testing' for analysis_type)
+        4. Field/Inventory: Store_ID, Inventory_Level, Low_Stock_Alerts, Daily_Consumption, Days_to_Depletion, timestamp (Use 'inventory' or 'field' for analysis_type)
+        
+        Note: The 'timestamp' column is crucial for time_range filtering.
+        """).strip()
+
+        # Static part of every chat prompt, sent as the model's system instruction so each
+        # request carries only the user question (and the unchanged prefix stays cacheable)
+        self.system_instruction = f"""
+You are a specialized Data Analyst AI. Your sole task is to convert a user's natural language question into a structured JSON query that drives an analytical backend.
+
+DATA CONTEXT:
+{self.data_schema}
+
+INSTRUCTIONS:
+1. Parse the user's intent. If they ask for a 'trend', a 'chart', 'graph', 'performance', or 'comparison', set 'requires_visualization' to true.
+2. Identify the primary data domain and set 'analysis_type' (must be one of the four defined domains).
+3. Extract any specific filters (like 'last month', 'SKU-101', or 'Line-A').
+4. The 'response' field should be a short, encouraging confirmation of the task.
+5. You MUST return ONLY the JSON object, strictly following the defined schema.
+"""
+
         # SDK Configuration
         if not HAS_SDK:
             print("❌ Google Generative AI SDK not installed")
@@ -106,14 +338,25 @@ class AIEngine:
             self.genai_client = False
         else:
             try:
-                # Configure the Gemini API
-                genai.configure(api_key=self.api_key)
+                # Configure the Gemini API over gRPC: one HTTP/2 channel, opened once per
+                # process and kept alive, that chat calls and embeddings multiplex over
+                genai.configure(api_key=self.api_key, transport='grpc')
                 
-                # Test the configuration with a simple call
-                model = genai.GenerativeModel('gemini-1.5-flash')
-                test_response = model.generate_content("Say 'OK' if you're working")
+                # The one configured model reused by every chat call; validated with a
+                # token count so the startup check does not spend a generation
+                model = genai.GenerativeModel(
+                    'gemini-1.5-flash',
+                    system_instruction=self.system_instruction,
+                    generation_config=genai.types.GenerationConfig(
+                        temperature=0.2,
+                        response_mime_type="application/json",
+                        response_schema=RESPONSE_SCHEMA
+                    )
+                )
+                test_response = model.count_tokens("Say 'OK' if you're working")
                 
-                if test_response and test_response.text:
+                if test_response and test_response.total_tokens:
+                    self.chat_model = model
                     print(f"✅ Gemini SDK configured successfully")
                     print(f"   API Key: {self.api_key[:10]}...{self.api_key[-4:]}")
                     self.genai_client = True
@@ -126,106 +369,201 @@ class AIEngine:
                 print(f"   API Key starts with: {self.api_key[:10] if self.api_key else 'None'}...")
                 self.genai_client = False
         
-        # Define the data schema for Gemini
-        self.data_schema = """
-        MongoDB Data Schema (The system is analyzing a Pandas DataFrame merged from these four collections):
-        1. Sales: Bill_ID, Revenue, Profit, Quantity, SKU, timestamp (Use 'sales' for analysis_type)
-        2. Manufacturing: Batch_ID, Quantity_Produced, Defects, Defect_Rate, Line_ID, SKU, timestamp (Use 'manufacturing' for analysis_type)
-        3. Testing: Test_ID, Batch_ID, Pass_Fail_Status, timestamp (Use 'testing' for analysis_type)
-        4. Field/Inventory: Store_ID, Inventory_Level, Low_Stock_Alerts, Daily_Consumption, Days_to_Depletion, timestamp (Use 'inventory' or 'field' for analysis_type)
-        
-        Note: The 'timestamp' column is crucial for time_range filtering.
-        """
+        # Answered chat queries: (normalized message, data fingerprint) -> (response_text, chart spec)
+        self._query_cache = OrderedDict()
+        self._query_cache_lock = threading.Lock()
+
+        # Structured Gemini intents: normalized question -> (literal tokens, parsed JSON),
+        # with unit embeddings stacked row-aligned in _intent_matrix for similarity lookups
+        self._intents = OrderedDict()
+        self._intent_keys = []
+        self._intent_matrix = None
+        self._intent_lock = threading.Lock()
+
+        # Pre-indexed copies of loaded datasets for _apply_filters: fingerprint -> index
+        self._filter_indexes = OrderedDict()
+        self._filter_index_lock = threading.Lock()
+
+        # Fingerprints of loaded frame objects: id -> (weakref to frame, fingerprint)
+        self._fingerprints = OrderedDict()
+        self._fingerprint_lock = threading.Lock()
+
+        # Results per analysed frame object: (analysis, id) -> (weakref to frame, result)
+        self._analysis_memo = OrderedDict()
+        self._analysis_memo_lock = threading.Lock()
 
     def analyze_sales(self, sales_df):
-        if sales_df.empty: return {'total_revenue': 0, 'total_profit': 0, 'profit_margin': 0, 'revenue_trend': pd.DataFrame(), 'top_products': pd.DataFrame()}
-        if 'Revenue' not in sales_df.columns: return {'total_revenue': 0, 'total_profit': 0, 'profit_margin': 0, 'revenue_trend': pd.DataFrame(), 'top_products': pd.DataFrame()}
-        
-        if 'Profit' not in sales_df.columns:
-            sales_df['Profit'] = sales_df['Revenue'] * 0.40
+        return self._memoized_analysis('sales', sales_df, self._sales_analysis)
+
+    @staticmethod
+    @st.cache_data(show_spinner=False, max_entries=ANALYSIS_CACHE_ENTRIES)
+    def _sales_analysis(sales_df):
+        """Sales KPIs, daily revenue trend and top products (memoized on the frame's contents)"""
+        # Schema snapshot: one hashed set instead of repeated Index membership scans
+        have = frozenset(sales_df.columns).__contains__
+        if sales_df.empty or not have('Revenue'): return dict(_EMPTY_SALES)
+
+        # Read-only: derived quantities live in local arrays and small result frames,
+        # so the caller's (cached, thread-shared) frame is never copied or extended
 
-        total_revenue = sales_df['Revenue'].sum()
-        total_profit = sales_df['Profit'].sum()
+        # Profit normally arrives precomputed at ingest; otherwise derive it from the
+        # reduced revenue sums rather than materializing a per-row column
+        has_profit = have('Profit')
+        revenue = sales_df['Revenue']
+        profit = sales_df['Profit'] if has_profit else None
+
+        total_revenue = revenue.sum()
+        total_profit = profit.sum() if has_profit else total_revenue * PROFIT_MARGIN
         profit_margin = (total_profit / total_revenue * 100) if total_revenue > 0 else 0
 
-        revenue_trend = pd.DataFrame()
-        if 'timestamp' in sales_df.columns:
-            sales_df['Date'] = pd.to_datetime(sales_df['timestamp']).dt.date
-            revenue_trend = sales_df.groupby('Date').agg({'Revenue': 'sum', 'Profit': 'sum'}).reset_index().sort_values('Date')
+        revenue_trend = None
+        if have('timestamp'):
+            revenue_trend = daily_sums(sales_df['timestamp'], {'Revenue': revenue, 'Profit': profit} if has_profit else {'Revenue': revenue})
+            if not has_profit:
+                revenue_trend['Profit'] = revenue_trend['Revenue'] * PROFIT_MARGIN
 
-        top_products = pd.DataFrame()
-        if 'SKU' in sales_df.columns:
-            top_products = sales_df.groupby('SKU').agg({'Revenue': 'sum', 'Quantity': 'sum', 'Profit': 'sum'}).reset_index()
-            top_products = top_products.sort_values('Revenue', ascending=False).head(10)
+        top_products = None
+        if have('SKU'):
+            # SKUs hashed once, every summed column reduced with bincount; argpartition
+            # picks the top 10 so only those ten SKUs are ever sorted or materialized
+            sku_cols = ['Revenue', 'Quantity', 'Profit'] if has_profit else ['Revenue', 'Quantity']
+            skus, sku_sums = group_sums(sales_df['SKU'], {col: sales_df[col] for col in sku_cols})
+            top = top_k_indices(sku_sums['Revenue'], 10)
+            top_products = pd.DataFrame({'SKU': skus[top], **{col: sums[top] for col, sums in sku_sums.items()}})
+            if not has_profit:
+                top_products['Profit'] = top_products['Revenue'] * PROFIT_MARGIN
 
         return {'total_revenue': total_revenue, 'total_profit': total_profit, 'profit_margin': profit_margin, 'revenue_trend': revenue_trend, 'top_products': top_products}
 
     def analyze_quality(self, manufacturing_df):
-        if manufacturing_df.empty: return {'avg_defect_rate': 0, 'total_defects': 0, 'total_produced': 0, 'defect_trend': pd.DataFrame(), 'line_performance': pd.DataFrame(), 'anomalies': []}
-        
-        # Initialize as float (0.0)
-        manufacturing_df['Defect_Rate'] = 0.0
-        
-        if 'Quantity_Produced' in manufacturing_df.columns and 'Defects' in manufacturing_df.columns:
-            mask = manufacturing_df['Quantity_Produced'] > 0
-            manufacturing_df.loc[mask, 'Defect_Rate'] = (manufacturing_df.loc[mask, 'Defects'] / manufacturing_df.loc[mask, 'Quantity_Produced'] * 100)
+        return self._memoized_analysis('quality', manufacturing_df, self._quality_analysis)
 
-        total_produced = manufacturing_df['Quantity_Produced'].sum()
-        total_defects = manufacturing_df['Defects'].sum()
+    @staticmethod
+    @st.cache_data(show_spinner=False, max_entries=ANALYSIS_CACHE_ENTRIES)
+    def _quality_analysis(manufacturing_df):
+        """Defect KPIs, daily defect trend and per-line performance (memoized on the frame's contents)"""
+        have = frozenset(manufacturing_df.columns).__contains__
+        if manufacturing_df.empty or not (have('Quantity_Produced') and have('Defects')): return {**_EMPTY_QUALITY, 'anomalies': []}
+
+        # Read-only: every metric below is computed from column arrays, nothing is added to the frame
+        qty_col = manufacturing_df['Quantity_Produced']
+        defects_col = manufacturing_df['Defects']
+        qty = qty_col.to_numpy(dtype=np.float64)
+        defects = defects_col.to_numpy(dtype=np.float64)
+
+        # Totals and per-line sums in one fused (JIT-compiled when available) pass
+        if have('Line_ID'):
+            codes, line_ids = group_codes(manufacturing_df['Line_ID'])
+        else:
+            codes, line_ids = np.full(len(manufacturing_df), -1), []
+        total_produced, total_defects, line_qty, line_defects = quality_reduce(qty, defects, codes, len(line_ids))
         avg_defect_rate = (total_defects / total_produced * 100) if total_produced > 0 else 0
 
-        defect_trend = pd.DataFrame()
-        if 'timestamp' in manufacturing_df.columns:
-            manufacturing_df['Date'] = pd.to_datetime(manufacturing_df['timestamp']).dt.date
-            daily_stats = manufacturing_df.groupby('Date').agg({'Quantity_Produced': 'sum', 'Defects': 'sum'}).reset_index()
-            daily_stats['Defect_Rate'] = (daily_stats['Defects'] / daily_stats['Quantity_Produced'] * 100).fillna(0)
-            defect_trend = daily_stats.sort_values('Date')
+        defect_trend = None
+        if have('timestamp'):
+            defect_trend = daily_sums(manufacturing_df['timestamp'], {
+                'Quantity_Produced': qty_col,
+                'Defects': defects_col
+            })
+            defect_trend['Defect_Rate'] = safe_ratio(defect_trend['Defects'], defect_trend['Quantity_Produced'], 100.0)
 
-        line_performance = pd.DataFrame()
+        line_performance = None
         anomalies = []
-        if 'Line_ID' in manufacturing_df.columns:
-            line_stats = manufacturing_df.groupby('Line_ID').agg({'Quantity_Produced': 'sum', 'Defects': 'sum'}).reset_index()
-            line_stats['Defect_Rate'] = (line_stats['Defects'] / line_stats['Quantity_Produced'] * 100).fillna(0)
-            line_performance = line_stats.sort_values('Defect_Rate', ascending=False)
-            anomalies = line_stats[line_stats['Defect_Rate'] > 5]['Line_ID'].tolist()
+        if len(line_ids):
+            # Rank and flag lines on the per-line arrays; the frame is built once, already ordered
+            line_rate = safe_ratio(line_defects, line_qty, 100.0)
+            order = np.argsort(-line_rate, kind='stable')
+            line_ids, line_rate = np.asarray(line_ids)[order], line_rate[order]
+            anomalies = line_ids[line_rate > 5].tolist()
+            line_performance = pd.DataFrame({
+                'Line_ID': line_ids,
+                'Quantity_Produced': line_qty[order],
+                'Defects': line_defects[order],
+                'Defect_Rate': line_rate
+            })
 
         return {'avg_defect_rate': avg_defect_rate, 'total_defects': total_defects, 'total_produced': total_produced, 'defect_trend': defect_trend, 'line_performance': line_performance, 'anomalies': anomalies}
 
     def analyze_inventory(self, field_df):
-        if field_df.empty: return {'total_inventory': 0, 'low_stock_alerts': 0, 'avg_days_to_depletion': 0, 'critical_stores': pd.DataFrame(), 'inventory_trend': pd.DataFrame()}
+        return self._memoized_analysis('inventory', field_df, self._inventory_analysis)
 
-        # Initialize as float (0.0)
-        field_df['Days_to_Depletion'] = 0.0
-        
-        if 'Inventory_Level' in field_df.columns and 'Daily_Consumption' in field_df.columns:
-            mask = field_df['Daily_Consumption'] > 0
-            field_df.loc[mask, 'Days_to_Depletion'] = (field_df.loc[mask, 'Inventory_Level'] / field_df.loc[mask, 'Daily_Consumption'])
-        
-        field_df['Days_to_Depletion'] = field_df['Days_to_Depletion'].replace([np.inf, -np.inf], 999.0)
+    @staticmethod
+    @st.cache_data(show_spinner=False, max_entries=ANALYSIS_CACHE_ENTRIES)
+    def _inventory_analysis(field_df):
+        """Inventory KPIs, critical stores and daily inventory trend (memoized on the frame's contents)"""
+        have = frozenset(field_df.columns).__contains__
+        if field_df.empty or not (have('Inventory_Level') and have('Low_Stock_Alerts')): return dict(_EMPTY_INVENTORY)
+        inventory = field_df['Inventory_Level']
+        alerts = field_df['Low_Stock_Alerts']
+
+        # Days of stock left as a plain array (one fused guarded divide, 0.0 where nothing
+        # is consumed); the caller's frame is read, never extended
+        if have('Daily_Consumption'):
+            days_left = safe_ratio(inventory, field_df['Daily_Consumption'])
+        else:
+            days_left = np.zeros(len(field_df))
         
-        total_inventory = field_df['Inventory_Level'].sum()
-        low_stock_alerts = field_df['Low_Stock_Alerts'].sum()
-        avg_days_to_depletion = field_df[field_df['Days_to_Depletion'] < 999]['Days_to_Depletion'].mean()
+        total_inventory = inventory.sum()
+        low_stock_alerts = alerts.sum()
+        # Masked mean (no gathered copy); the comparison also drops any NaN/inf from bad inputs
+        in_range = days_left < 999
+        avg_days_to_depletion = days_left.mean(where=in_range) if in_range.any() else 0
 
-        critical_stores = pd.DataFrame()
-        if 'Store_ID' in field_df.columns:
-            critical_stores = field_df[field_df['Days_to_Depletion'] < 7][['Store_ID', 'Inventory_Level', 'Daily_Consumption', 'Days_to_Depletion']].sort_values('Days_to_Depletion')
+        critical_stores = None
+        if have('Store_ID'):
+            critical = days_left < 7
+            if critical.any():
+                # Only the few critical rows are materialized
+                critical_stores = field_df.loc[critical, ['Store_ID', 'Inventory_Level', 'Daily_Consumption']]
+                critical_stores['Days_to_Depletion'] = days_left[critical]
+                critical_stores = critical_stores.sort_values('Days_to_Depletion')
 
-        inventory_trend = pd.DataFrame()
-        if 'timestamp' in field_df.columns:
-            field_df['Date'] = pd.to_datetime(field_df['timestamp']).dt.date
-            daily_inventory = field_df.groupby('Date').agg({'Inventory_Level': 'sum', 'Low_Stock_Alerts': 'sum'}).reset_index()
-            inventory_trend = daily_inventory.sort_values('Date')
+        inventory_trend = None
+        if have('timestamp'):
+            inventory_trend = daily_sums(field_df['timestamp'], {
+                'Inventory_Level': inventory,
+                'Low_Stock_Alerts': alerts
+            })
 
         return {'total_inventory': total_inventory, 'low_stock_alerts': low_stock_alerts, 'avg_days_to_depletion': avg_days_to_depletion if not pd.isna(avg_days_to_depletion) else 0, 'critical_stores': critical_stores, 'inventory_trend': inventory_trend}
 
     def analyze_testing(self, testing_df):
-        if testing_df.empty: return {'total_tests': 0, 'pass_rate': 0, 'failed_tests': 0}
+        return self._memoized_analysis('testing', testing_df, self._testing_analysis)
+
+    @staticmethod
+    @st.cache_data(show_spinner=False, max_entries=ANALYSIS_CACHE_ENTRIES)
+    def _testing_analysis(testing_df):
+        """Test totals and pass rate (memoized on the frame's contents)"""
+        if testing_df.empty: return dict(_EMPTY_TESTING)
         total_tests = len(testing_df)
-        failed_tests = (testing_df['Pass_Fail_Status'].str.lower() == 'failed').sum() if 'Pass_Fail_Status' in testing_df.columns else 0
+        # Per-status counts over the category codes; only the few distinct labels are lowercased
+        failed_tests = status_count(testing_df['Pass_Fail_Status'], 'failed') if 'Pass_Fail_Status' in testing_df.columns else 0
         pass_rate = ((total_tests - failed_tests) / total_tests * 100) if total_tests > 0 else 0
         return {'total_tests': total_tests, 'pass_rate': pass_rate, 'failed_tests': failed_tests}
 
+    def _memoized_analysis(self, name, df, analysis):
+        """
+        Run a cached analysis on its projected columns, reusing the result for a frame object seen before
+
+        st.cache_data keys on contents and so hashes every projected column on
+        each call; loaded frames are replaced, never mutated, so repeat calls
+        on the same object (dashboard reruns) skip that hash entirely.
+        """
+        key = (name, id(df))
+        with self._analysis_memo_lock:
+            entry = self._analysis_memo.get(key)
+            # The weakref guards against a recycled id belonging to another frame
+            if entry is not None and entry[0]() is df:
+                self._analysis_memo.move_to_end(key)
+                return entry[1]
+
+        result = analysis(_project(df, ANALYSIS_COLUMNS[name]))
+        with self._analysis_memo_lock:
+            self._analysis_memo[key] = (weakref.ref(df), result)
+            while len(self._analysis_memo) > ANALYSIS_MEMO_SIZE:
+                self._analysis_memo.popitem(last=False)
+        return result
+
     def run_all_analyses(self, data_dict):
         return {
             'sales': self.analyze_sales(data_dict.get('sales', pd.DataFrame())),
@@ -241,145 +579,417 @@ class AIEngine:
         Uses the Google SDK to call Gemini, enforcing structured JSON output.
         """
         if not self.genai_client:
-            error_msg = "AI Engine not configured. "
             if not HAS_SDK:
-                error_msg += "Google Generative AI SDK is not installed. Run: pip install google-generativeai"
+                reason = "Google Generative AI SDK is not installed. Run: pip install google-generativeai"
             elif not self.api_key:
-                error_msg += "GEMINI_API_KEY not found. Add it to .streamlit/secrets.toml"
+                reason = "GEMINI_API_KEY not found. Add it to .streamlit/secrets.toml"
             else:
-                error_msg += "Configuration failed. Check your API key."
+                reason = "Configuration failed. Check your API key."
             
-            return {"error": error_msg}
+            return {"error": f"AI Engine not configured. {reason}"}
 
-        try:
-            model = genai.GenerativeModel(
-                'gemini-1.5-flash',
-                generation_config=genai.types.GenerationConfig(
-                    temperature=0.2,
-                    response_mime_type="application/json",
-                    response_schema=RESPONSE_SCHEMA
+        for attempt in range(GEMINI_MAX_RETRIES + 1):
+            try:
+                # One unary call with a bounded wait (the JSON is only usable once complete,
+                # so streaming would gain nothing); the gRPC channel is shared and kept alive
+                response = self.chat_model.generate_content(
+                    prompt,
+                    request_options={'timeout': GEMINI_TIMEOUT_SECONDS}
                 )
-            )
-            response = model.generate_content(prompt)
-            
-            if response.text:
-                parsed = json.loads(response.text)
-                return parsed
-            
-            return {"error": "Empty response from AI"}
+                
+                # The reply is schema-constrained JSON (no code fences to strip); .text joins
+                # the reply parts, so it is read once
+                text = response.text
+                if text:
+                    return json_loads(text)
+                
+                return {"error": "Empty response from AI"}
 
-        except json.JSONDecodeError as e:
-            print(f"❌ JSON Decode Error: {e}")
-            print(f"   Raw response: {response.text[:200] if response and response.text else 'None'}")
-            return {"error": f"Invalid JSON response from AI: {str(e)}"}
-        
-        except Exception as e:
-            error_str = str(e)
-            print(f"❌ Gemini API Error: {error_str}")
+            except json.JSONDecodeError as e:
+                print(f"❌ JSON Decode Error: {e}")
+                print(f"   Raw response: {response.text[:200] if response and response.text else 'None'}")
+                return {"error": f"Invalid JSON response from AI: {str(e)}"}
             
-            if "429" in error_str or "RESOURCE_EXHAUSTED" in error_str:
-                return {"error": "API quota exceeded. Please wait a moment and try again."}
-            elif "403" in error_str or "PERMISSION_DENIED" in error_str:
-                return {"error": "API key invalid or doesn't have permission. Check your GEMINI_API_KEY."}
-            elif "400" in error_str or "INVALID_ARGUMENT" in error_str:
-                return {"error": "Invalid request to AI. Please rephrase your question."}
+            except Exception as e:
+                error_str = str(e)
+                rate_limited = isinstance(e, GEMINI_RATE_LIMIT_ERRORS)
+                if isinstance(e, GEMINI_TRANSIENT_ERRORS) and attempt < GEMINI_MAX_RETRIES:
+                    # Exponential backoff with jitter so concurrent callers do not retry in lockstep
+                    time.sleep(2 ** attempt + random.random())
+                    continue
+                print(f"❌ Gemini API Error: {error_str}")
+                
+                if rate_limited:
+                    return {"error": "API quota exceeded. Please wait a moment and try again."}
+                elif "403" in error_str or "PERMISSION_DENIED" in error_str:
+                    return {"error": "API key invalid or doesn't have permission. Check your GEMINI_API_KEY."}
+                elif "400" in error_str or "INVALID_ARGUMENT" in error_str:
+                    return {"error": "Invalid request to AI. Please rephrase your question."}
+                else:
+                    return {"error": f"AI API Error: {error_str}"}
+
+    def _embed(self, text):
+        """
+        Unit-length float32 embedding of text, or None when embeddings are unavailable
+
+        A locally installed sentence-transformers model is preferred (no API
+        round trip before a cache hit); Gemini embeddings are used otherwise.
+        One source is used for the whole process, so cached vectors always
+        share a dimension.
+        """
+        if not (HAS_SENTENCE_TRANSFORMERS or self.genai_client):
+            return None
+        try:
+            if HAS_SENTENCE_TRANSFORMERS:
+                vector = get_local_embedder().encode(text)
             else:
-                return {"error": f"AI API Error: {error_str}"}
+                vector = genai.embed_content(model=EMBEDDING_MODEL, content=text, task_type='semantic_similarity')['embedding']
+            vector = np.asarray(vector, dtype=np.float32)
+        except Exception as e:
+            print(f"⚠️ Embedding failed, skipping semantic cache: {e}")
+            return None
+        norm = np.linalg.norm(vector)
+        return vector / norm if norm > 0 else None
+
+    def _try_local_route(self, question):
+        """
+        Build the parsed intent of an obvious chart question locally, or None
+
+        A question that names exactly one domain and a chart, optionally a
+        recognised time range, and otherwise only filler words needs nothing
+        from Gemini; anything ambiguous or possibly carrying filters falls
+        through to it.
+        """
+        domains = {match.lastgroup for match in LOCAL_DOMAIN_PATTERN.finditer(question)}
+        charts = {match.lastgroup for match in LOCAL_VIZ_PATTERN.finditer(question)}
+        if len(domains) != 1 or not charts:
+            return None
+        
+        time_match = TIME_RANGE_PATTERN.search(question)
+        rest = TIME_RANGE_PATTERN.sub(' ', question)
+        rest = LOCAL_VIZ_PATTERN.sub(' ', LOCAL_DOMAIN_PATTERN.sub(' ', rest))
+        if not set(re.findall(r'[\w-]+', rest)) <= LOCAL_ROUTE_WORDS:
+            return None
+        
+        domain = domains.pop()
+        viz_type = next(chart for chart in ('line_chart', 'pie_chart', 'bar_chart') if chart in charts)
+        filters = {'domain': LOCAL_ROUTE_FILTERS[domain]}
+        if time_match is not None:
+            filters['time_range'] = time_match.group()
+        return {
+            'requires_visualization': True,
+            'analysis_type': domain,
+            'visualization_type': viz_type,
+            'filters': filters,
+            'response': f"Here is the {domain} analysis you asked for."
+        }
+
+    def _cached_intent(self, question, embedding=None, literals=None):
+        """
+        Return the parsed Gemini intent of an equivalent earlier question, or None
+
+        An exact (normalized) match needs no embedding. Otherwise the most
+        similar cached question whose cosine similarity reaches
+        INTENT_SIMILARITY_THRESHOLD and that names the same literal tokens
+        (IDs, numbers, time-range, chart and domain words, key values) is
+        reused, so "SKU-101" never reuses "SKU-102" nor "pie" a "bar" chart.
+        """
+        with self._intent_lock:
+            entry = self._intents.get(question)
+            if entry is not None:
+                self._intents.move_to_end(question)
+                return entry[1]
+            if embedding is None or self._intent_matrix is None:
+                return None
+            sims = self._intent_matrix @ embedding
+            candidates = np.flatnonzero(sims >= INTENT_SIMILARITY_THRESHOLD)
+            # Most similar first: a close neighbour with other literals does not hide a match
+            for row in candidates[np.argsort(-sims[candidates], kind='stable')]:
+                cached_literals, parsed = self._intents[self._intent_keys[row]]
+                if cached_literals == literals:
+                    return parsed
+            return None
+
+    def _store_intent(self, question, embedding, parsed, literals=None):
+        """Remember a parsed intent (similarity-searchable when embedded), evicting the oldest beyond INTENT_CACHE_SIZE"""
+        with self._intent_lock:
+            if question in self._intents:
+                return
+            self._intents[question] = (literals, parsed)
+            if embedding is not None:
+                self._intent_keys.append(question)
+                row = embedding[np.newaxis, :]
+                self._intent_matrix = row if self._intent_matrix is None else np.vstack((self._intent_matrix, row))
+            while len(self._intents) > INTENT_CACHE_SIZE:
+                oldest, _ = self._intents.popitem(last=False)
+                if oldest in self._intent_keys:
+                    row = self._intent_keys.index(oldest)
+                    del self._intent_keys[row]
+                    self._intent_matrix = np.delete(self._intent_matrix, row, axis=0) if self._intent_keys else None
+
+    def _build_filter_index(self, df):
+        """
+        Pre-index a loaded DataFrame for repeated chat filtering
+
+        Returns:
+            Dictionary with the categorical working frame, the timestamp sort
+            order (for searchsorted range cuts) and per-key row positions
+        """
+        # Shallow copy: converted columns are replaced on the copy, the caller's frame is untouched
+        frame = _coerce_categoricals(df.copy(deep=False))
+        index = {'frame': frame, 'groups': {}}
+
+        if 'timestamp' in frame.columns:
+            # Loaded frames arrive parsed already; only raw columns are converted
+            if frame['timestamp'].dtype.kind != 'M':
+                frame['timestamp'] = pd.to_datetime(frame['timestamp'], errors='coerce')
+            index['ts_tz'] = frame['timestamp'].dt.tz
+            # int64 nanoseconds (UTC for tz-aware data); NaT becomes int64 min and sorts first
+            ts = frame['timestamp'].values.astype('datetime64[ns]').view('i8')
+            order = np.argsort(ts, kind='stable')
+            index['ts_order'] = order
+            index['ts_sorted'] = ts[order]
+
+        # Row positions per key value; domain is matched case-insensitively by lowercasing
+        # its few distinct labels and comparing integer codes (no per-row string copies)
+        if 'domain' in frame.columns:
+            codes, labels = group_codes(frame['domain'])
+            label_codes, lowered = pd.factorize(pd.Index(labels).str.lower())
+            row_labels = np.append(label_codes, -1)[codes]  # missing domain (-1) stays -1
+            index['groups']['domain'] = {label: np.flatnonzero(row_labels == i) for i, label in enumerate(lowered)}
+        for col in ('SKU', 'Line_ID'):
+            if col in frame.columns:
+                index['groups'][col] = frame.groupby(col, sort=False, observed=True).indices
+
+        # Key values as normalized question text, for the intent cache's literal guard
+        index['key_values'] = frozenset(
+            normalized
+            for col in _KEY_VALUE_COLUMNS if col in frame.columns
+            for normalized in (' '.join(re.findall(r'[\w-]+', str(value).lower())) for value in frame[col].cat.categories)
+            if normalized
+        )
+
+        return index
+
+    def _get_filter_index(self, df):
+        """Filter index for df, built once per loaded dataset (keyed on its content fingerprint)"""
+        key = self._data_fingerprint(df)
+        with self._filter_index_lock:
+            index = self._filter_indexes.get(key)
+            if index is not None:
+                self._filter_indexes.move_to_end(key)
+                return index
+
+        index = self._build_filter_index(df)
+        with self._filter_index_lock:
+            self._filter_indexes[key] = index
+            while len(self._filter_indexes) > FILTER_INDEX_CACHE_SIZE:
+                self._filter_indexes.popitem(last=False)
+        return index
 
     def _apply_filters(self, df, filters):
         """Apply filters to the dataframe based on Gemini's extracted parameters."""
-        filtered_df = df.copy()
+        if not filters or df.empty:
+            # Nothing to select: skip the fingerprint and index lookup (or first-time build)
+            return df
+        index = self._get_filter_index(df)
+        frame = index['frame']
+        groups = index['groups']
+        empty = np.array([], dtype=np.intp)
+        selections = []
         
         # Apply domain filter if specified
-        if filters.get('domain'):
-            domain = filters['domain'].lower()
-            if 'domain' in filtered_df.columns:
-                filtered_df = filtered_df[filtered_df['domain'].str.lower() == domain]
+        if filters.get('domain') and 'domain' in groups:
+            selections.append(groups['domain'].get(filters['domain'].lower(), empty))
         
         # Apply SKU filter if specified
-        if filters.get('sku') and 'SKU' in filtered_df.columns:
-            filtered_df = filtered_df[filtered_df['SKU'] == filters['sku']]
+        if filters.get('sku') and 'SKU' in groups:
+            selections.append(groups['SKU'].get(filters['sku'], empty))
         
         # Apply Line_ID filter if specified
-        if filters.get('line_id') and 'Line_ID' in filtered_df.columns:
-            filtered_df = filtered_df[filtered_df['Line_ID'] == filters['line_id']]
+        if filters.get('line_id') and 'Line_ID' in groups:
+            selections.append(groups['Line_ID'].get(filters['line_id'], empty))
         
-        # Apply time range filter if specified
-        if filters.get('time_range') and 'timestamp' in filtered_df.columns:
-            filtered_df['timestamp'] = pd.to_datetime(filtered_df['timestamp'])
-            now = datetime.now()
+        # Apply time range filter if specified (binary search on the sorted timestamps)
+        if filters.get('time_range') and 'ts_sorted' in index:
+            # One clock read in the data's timezone; .value is int64 ns on the same basis as
+            # the indexed timestamps (UTC for tz-aware data, wall clock for naive data)
+            current = pd.Timestamp.now(tz=index['ts_tz'])
             
-            time_range = filters['time_range'].lower()
-            if 'last 7 days' in time_range or 'last week' in time_range:
-                start_date = now - timedelta(days=7)
-            elif 'last month' in time_range:
-                start_date = now - timedelta(days=30)
-            elif 'this week' in time_range:
-                start_date = now - timedelta(days=now.weekday())
+            match = TIME_RANGE_PATTERN.search(filters['time_range'].lower())
+            if match is None:
+                lookback = None
+            elif match.group() == 'this week':
+                lookback = current.weekday() * DAY_NS
             else:
-                start_date = filtered_df['timestamp'].min()
+                lookback = TIME_RANGE_WINDOWS[match.group()]
             
-            filtered_df = filtered_df[filtered_df['timestamp'] >= start_date]
+            if lookback is None:
+                # Whole range: only rows without a timestamp drop out
+                lo = np.searchsorted(index['ts_sorted'], np.iinfo(np.int64).min, side='right')
+            else:
+                lo = np.searchsorted(index['ts_sorted'], np.int64(current.value - lookback), side='left')
+            selections.append(index['ts_order'][lo:])
         
-        return filtered_df
+        if not selections:
+            # Read-only downstream (_execute_analysis never mutates), so no copy is needed
+            return frame
+        if len(selections) == 1 and not filters.get('time_range'):
+            # A single key selection is already ascending row positions: take it as is
+            return frame.iloc[selections[0]]
+        
+        # Combine the position sets on one per-row hit counter (no sorting or set
+        # intersection); flatnonzero yields ascending positions in the original row order
+        hits = np.zeros(len(frame), dtype=np.uint8)
+        for selected in selections:
+            hits[selected] += 1
+        return frame.iloc[np.flatnonzero(hits == len(selections))]
+
+    def _sales_chat_analysis(self, df, cols, visualization_type):
+        """Revenue total plus a daily trend (line) or top-SKU bars"""
+        if not ('Revenue' in cols and 'timestamp' in cols):
+            return "", None
+        total_rev = df['Revenue'].sum()
+        insight = f"💰 **Sales Summary:** Total Revenue is **${total_rev:,.2f}** for the filtered data."
+        
+        # Only the grouping the chosen chart needs is computed
+        if 'line' in visualization_type:
+            daily = daily_sums(df['timestamp'], {'Revenue': df['Revenue']})
+            chart = {'kind': 'line', 'x': daily['Date'].to_numpy(), 'y': daily['Revenue'].to_numpy(),
+                     'x_title': 'Date', 'y_title': 'Revenue', 'title': 'Revenue Trend Over Time', 'color': '#667eea'}
+        else:
+            # Partial selection of the ten best SKUs instead of ordering every SKU total
+            skus, sku_sums = group_sums(df['SKU'], {'Revenue': df['Revenue']})
+            top = top_k_indices(sku_sums['Revenue'], 10)
+            chart = {'kind': 'bar', 'x': pd.Index(skus)[top].astype(str).to_numpy(), 'y': sku_sums['Revenue'][top],
+                     'x_title': 'SKU', 'y_title': 'Revenue', 'title': 'Top 10 SKUs by Revenue', 'color': '#667eea'}
+        return insight, chart
+
+    def _manufacturing_chat_analysis(self, df, cols, visualization_type):
+        """Average line defect rate plus a daily trend (line) or per-line bars"""
+        if not ('Defect_Rate' in cols and 'Line_ID' in cols):
+            return "", None
+        # Per-line mean rate in one sum-and-count pass over the line codes (no hashed groupby)
+        rate = df['Defect_Rate']
+        lines, line_rate, rated = group_means(df['Line_ID'], rate)
+        avg_rate = np.nanmean(line_rate) if np.any(rated > 0) else np.nan
+        insight = f"🔧 **Quality Summary:** Avg Defect Rate across lines: **{avg_rate:.2f}%**."
+        
+        if 'line' in visualization_type and 'timestamp' in cols:
+            # Daily mean as day sums over day counts: the bincount day ids come out date-ordered,
+            # so neither a hashed groupby nor a sort is needed (missing rates are left out of both)
+            daily_rate = daily_sums(df['timestamp'], {'Defect_Rate': rate, 'Rated': rate.notna()})
+            rated = daily_rate.pop('Rated').to_numpy()
+            daily_rate['Defect_Rate'] = np.where(rated > 0, safe_ratio(daily_rate['Defect_Rate'], rated), np.nan)
+            chart = {'kind': 'line', 'x': daily_rate['Date'].to_numpy(), 'y': daily_rate['Defect_Rate'].to_numpy(),
+                     'x_title': 'Date', 'y_title': 'Defect_Rate', 'title': 'Daily Defect Rate Trend', 'color': '#ef4444'}
+        else:
+            lines = pd.Index(lines)
+            order = lines.argsort()
+            chart = {'kind': 'bar', 'x': lines[order].astype(str).to_numpy(), 'y': line_rate[order],
+                     'x_title': 'Line_ID', 'y_title': 'Defect_Rate', 'title': 'Defect Rate by Production Line',
+                     'color_scale': 'RdYlGn_r'}
+        return insight, chart
+
+    def _testing_chat_analysis(self, df, cols, visualization_type):
+        """Pass rate plus a passed/failed pie"""
+        if 'Pass_Fail_Status' not in cols:
+            return "", None
+        passed = status_count(df['Pass_Fail_Status'], 'passed')
+        failed = len(df) - passed
+        insight = f"🧪 **Testing Summary:** Total Tests: {len(df)}. Pass Rate: **{(passed / len(df) * 100):.1f}%**."
+        chart = {'kind': 'pie', 'names': ['Passed', 'Failed'], 'values': np.array([passed, failed], dtype=np.int64),
+                 'title': 'Test Results Distribution', 'colors': ['#10b981', '#ef4444'], 'hole': 0.4}
+        return insight, chart
+
+    def _inventory_chat_analysis(self, df, cols, visualization_type):
+        """Total stock plus the ten best-stocked stores"""
+        if not ('Inventory_Level' in cols and 'Store_ID' in cols):
+            return "", None
+        total_inv = df['Inventory_Level'].sum()
+        insight = f"📦 **Inventory Summary:** Total Stock: **{total_inv:,.0f}** for filtered stores/SKUs."
+        
+        # Per-store means in one pass over the store codes, then a partial top-10 selection
+        # over the stores that have a level at all (no hashed groupby, no full sort)
+        stores, store_mean, stocked_rows = group_means(df['Store_ID'], df['Inventory_Level'])
+        stocked = np.flatnonzero(stocked_rows > 0)
+        store_mean = store_mean[stocked]
+        top = top_k_indices(store_mean, 10)
+        chart = {'kind': 'bar', 'x': pd.Index(stores)[stocked[top]].astype(str).to_numpy(), 'y': store_mean[top],
+                 'x_title': 'Store_ID', 'y_title': 'Inventory_Level', 'title': 'Average Inventory Level by Store', 'color': '#10b981'}
+        return insight, chart
+
+    # Chat analysis handler per resolved domain (see _analysis_domain)
+    CHAT_HANDLERS = {
+        'sales': _sales_chat_analysis,
+        'manufacturing': _manufacturing_chat_analysis,
+        'testing': _testing_chat_analysis,
+        'inventory': _inventory_chat_analysis
+    }
 
     def _execute_analysis(self, df, analysis_type, visualization_type):
-        """Analyzes the filtered data and generates the Plotly figure."""
+        """
+        Analyzes the filtered data and describes the chart to draw.
+
+        Returns (insight, chart) where chart is a plain spec dict (kind, x/y or
+        names/values arrays, titles, colors) rendered by the UI layer, or None.
+        Numeric series stay NumPy arrays so Plotly ships them as typed arrays.
+        """
         if df.empty:
             return "No data matches your criteria.", None
         
-        insight, fig = "", None
-        
-        # --- SALES ---
-        if 'sales' in analysis_type.lower() or 'revenue' in analysis_type.lower():
-            if 'Revenue' in df.columns and 'timestamp' in df.columns:
-                total_rev = df['Revenue'].sum()
-                insight = f"💰 **Sales Summary:** Total Revenue is **${total_rev:,.2f}** for the filtered data."
-                
-                df['Date'] = pd.to_datetime(df['timestamp']).dt.date
-                daily = df.groupby('Date')['Revenue'].sum().reset_index()
-                
-                if 'line' in visualization_type:
-                    fig = px.line(daily, x='Date', y='Revenue', title='Revenue Trend Over Time', color_discrete_sequence=['#667eea'])
-                else:
-                    top_sku = df.groupby('SKU')['Revenue'].sum().reset_index().sort_values('Revenue', ascending=False).head(10)
-                    fig = px.bar(top_sku, x='SKU', y='Revenue', title='Top 10 SKUs by Revenue', color_discrete_sequence=['#667eea'])
-
-        # --- MANUFACTURING ---
-        elif 'manufacturing' in analysis_type.lower() or 'quality' in analysis_type.lower():
-            if 'Defect_Rate' in df.columns and 'Line_ID' in df.columns:
-                line_stats = df.groupby('Line_ID')['Defect_Rate'].mean().reset_index()
-                avg_rate = line_stats['Defect_Rate'].mean()
-                insight = f"🔧 **Quality Summary:** Avg Defect Rate across lines: **{avg_rate:.2f}%**."
-                
-                if 'line' in visualization_type and 'timestamp' in df.columns:
-                    df['Date'] = pd.to_datetime(df['timestamp']).dt.date
-                    daily_rate = df.groupby('Date')['Defect_Rate'].mean().reset_index()
-                    fig = px.line(daily_rate, x='Date', y='Defect_Rate', title='Daily Defect Rate Trend', color_discrete_sequence=['#ef4444'])
-                else:
-                    fig = px.bar(line_stats, x='Line_ID', y='Defect_Rate', title='Defect Rate by Production Line', color='Defect_Rate', color_continuous_scale='RdYlGn_r')
-
-        # --- TESTING ---
-        elif 'testing' in analysis_type.lower():
-            if 'Pass_Fail_Status' in df.columns:
-                passed = (df['Pass_Fail_Status'].str.lower() == 'passed').sum()
-                failed = len(df) - passed
-                insight = f"🧪 **Testing Summary:** Total Tests: {len(df)}. Pass Rate: **{(passed / len(df) * 100):.1f}%**."
-                fig = px.pie(names=['Passed', 'Failed'], values=[passed, failed], title='Test Results Distribution', color_discrete_sequence=['#10b981', '#ef4444'], hole=0.4)
-
-        # --- INVENTORY ---
-        elif 'field' in analysis_type.lower() or 'inventory' in analysis_type.lower():
-            if 'Inventory_Level' in df.columns and 'Store_ID' in df.columns:
-                total_inv = df['Inventory_Level'].sum()
-                insight = f"📦 **Inventory Summary:** Total Stock: **{total_inv:,.0f}** for filtered stores/SKUs."
-                
-                top_stores = df.groupby('Store_ID')['Inventory_Level'].mean().reset_index().sort_values('Inventory_Level', ascending=False).head(10)
-                fig = px.bar(top_stores, x='Store_ID', y='Inventory_Level', title='Average Inventory Level by Store', color_discrete_sequence=['#10b981'])
+        domain = _analysis_domain(analysis_type)
+        if domain is None:
+            return "", None
+        # Column set built once for the handler's requirement checks
+        return self.CHAT_HANDLERS[domain](self, df, frozenset(df.columns), visualization_type)
 
-        if fig:
-            fig.update_layout(margin=dict(l=20, r=20, t=40, b=20))
-        
-        return insight, fig
+    def _data_fingerprint(self, df):
+        """
+        Content identity of a loaded dataset: row count, columns and a digest of every row
+
+        Two loads with the same shape and latest timestamp but different rows
+        get different fingerprints, so neither the filter index nor a cached
+        answer outlives the data it was built from. Loaded frames are replaced,
+        never mutated, so the O(N) row hash runs once per frame object rather
+        than on every chat message.
+        """
+        key = id(df)
+        with self._fingerprint_lock:
+            entry = self._fingerprints.get(key)
+            # The weakref guards against a recycled id belonging to another frame
+            if entry is not None and entry[0]() is df:
+                self._fingerprints.move_to_end(key)
+                return entry[1]
+
+        # Row order matters (the index stores positions), so the per-row hashes are digested in order
+        row_hashes = pd.util.hash_pandas_object(df).to_numpy()
+        fingerprint = (len(df), tuple(df.columns), hashlib.blake2b(row_hashes.tobytes(), digest_size=16).hexdigest())
+        with self._fingerprint_lock:
+            self._fingerprints[key] = (weakref.ref(df), fingerprint)
+            while len(self._fingerprints) > FINGERPRINT_CACHE_SIZE:
+                self._fingerprints.popitem(last=False)
+        return fingerprint
+
+    def _query_cache_key(self, user_message, full_df):
+        """Key a chat query on its normalized text and the loaded data's fingerprint"""
+        return ' '.join(user_message.lower().split()), self._data_fingerprint(full_df)
+
+    def _cached_answer(self, key):
+        """Return a previously computed (response_text, chart) for key, or None"""
+        with self._query_cache_lock:
+            answer = self._query_cache.get(key)
+            if answer is not None:
+                self._query_cache.move_to_end(key)
+            return answer
+
+    def _store_answer(self, key, answer):
+        """Remember a successful (response_text, chart) answer, evicting the oldest beyond QUERY_CACHE_SIZE"""
+        with self._query_cache_lock:
+            self._query_cache[key] = answer
+            self._query_cache.move_to_end(key)
+            while len(self._query_cache) > QUERY_CACHE_SIZE:
+                self._query_cache.popitem(last=False)
 
     def process_chat_query(self, user_message, full_df, chat_history=None):
         """
@@ -390,43 +1000,50 @@ class AIEngine:
         if full_df is None or full_df.empty:
             return "❌ Cannot analyze: No data has been loaded from MongoDB yet.", None
 
-        # 2. Prepare Data Context for Gemini
-        data_summary = f"Total Rows: {len(full_df)}\nColumns: {', '.join(full_df.columns)}\n"
-        
-        # 3. Prompt Construction
-        system_instruction = f"""
-You are a specialized Data Analyst AI. Your sole task is to convert a user's natural language question into a structured JSON query that drives an analytical backend.
+        # Repeated question on the same data: skip the API call, filtering and charting
+        cache_key = self._query_cache_key(user_message, full_df)
+        cached = self._cached_answer(cache_key)
+        if cached is not None:
+            return cached
 
-DATA CONTEXT:
-{self.data_schema}
+        # The same (or a near-identical) question was parsed before: reuse its intent
+        question = cache_key[0]
+        parsed_response = self._cached_intent(question)
+        if parsed_response is None:
+            # Obvious single-domain chart questions need no model round trip at all
+            parsed_response = self._try_local_route(question)
+        embedding = literals = None
+        if parsed_response is None:
+            embedding = self._embed(question)
+            if embedding is not None:
+                literals = _literal_tokens(question, self._get_filter_index(full_df)['key_values'])
+                parsed_response = self._cached_intent(question, embedding, literals)
 
-INSTRUCTIONS:
-1. Parse the user's intent. If they ask for a 'trend', a 'chart', 'graph', 'performance', or 'comparison', set 'requires_visualization' to true.
-2. Identify the primary data domain and set 'analysis_type' (must be one of the four defined domains).
-3. Extract any specific filters (like 'last month', 'SKU-101', or 'Line-A').
-4. The 'response' field should be a short, encouraging confirmation of the task.
-5. You MUST return ONLY the JSON object, strictly following the defined schema.
+        if parsed_response is None:
+            # 2. Prompt Construction (schema and rules live in the model's system instruction)
+            prompt = USER_PROMPT_TEMPLATE.format(question=user_message)
 
-User Question: "{user_message}"
-"""
-
-        # 4. Call API
-        try:
-            parsed_response = self._call_gemini_api(system_instruction)
-        except Exception as e:
-            return f"❌ Critical API Call Error: {str(e)}", None
+            # 3. Call API
+            try:
+                parsed_response = self._call_gemini_api(prompt)
+            except Exception as e:
+                return f"❌ Critical API Call Error: {str(e)}", None
 
-        # 5. Handle Errors Explicitly
-        if "error" in parsed_response:
-            return f"❌ System Error from AI: {parsed_response['error']}", None
+            # 4. Handle Errors Explicitly
+            if "error" in parsed_response:
+                return f"❌ System Error from AI: {parsed_response['error']}", None
+            self._store_intent(question, embedding, parsed_response, literals)
 
-        # 6. Process Success and Execute Analysis
+        # 5. Process Success and Execute Analysis
         response_text = parsed_response.get('response', 'Analysis requested.')
         requires_viz = parsed_response.get('requires_visualization', False)
 
-        fig = None
+        chart = None
+        relative_window = False
         if requires_viz:
             filters = parsed_response.get('filters', {})
+            # "last 7 days", "this week", ... are resolved against the clock at filter time
+            relative_window = bool(filters and TIME_RANGE_PATTERN.search(str(filters.get('time_range') or '').lower()))
             analysis_type = parsed_response.get('analysis_type', 'sales')
             viz_type = parsed_response.get('visualization_type', 'bar_chart')
             
@@ -434,10 +1051,20 @@ User Question: "{user_message}"
             # Simulate fetching/filtering the data based on Gemini's query
             filtered_df = self._apply_filters(full_df, filters)
             
-            # Run the specific analysis and get the chart
-            insight, fig = self._execute_analysis(filtered_df, analysis_type, viz_type)
+            # Run the specific analysis and get the chart spec
+            insight, chart = self._execute_analysis(filtered_df, analysis_type, viz_type)
             
             if insight and insight != "No data matches your criteria.":
                 response_text += f"\n\n**Data Insight:** {insight}"
 
-        return response_text, fig
+        # An answer over a relative time window goes stale as the window moves (the data
+        # fingerprint does not change), so only clock-independent answers are kept
+        if not relative_window:
+            self._store_answer(cache_key, (response_text, chart))
+        return response_text, chart
+
+
+@st.cache_resource(show_spinner=False)
+def get_ai_engine():
+    """Process-wide AIEngine shared by every session (configured once)"""
+    return AIEngine()
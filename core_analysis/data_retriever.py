@@ -5,9 +5,64 @@ Handles MongoDB Atlas connections and data retrieval with robust schema mapping
 
 import os
 import pandas as pd
+import numpy as np
+from concurrent.futures import ThreadPoolExecutor
 from pymongo import MongoClient
 from datetime import datetime, timedelta
 import streamlit as st
+from streamlit.runtime.scriptrunner import add_script_run_ctx, get_script_run_ctx
+from core_analysis.fastprep import safe_ratio
+
+# zstandard is optional: enables zstd wire compression (zlib ships with Python)
+HAS_ZSTD = False
+try:
+    import zstandard
+    HAS_ZSTD = True
+except Exception:
+    HAS_ZSTD = False
+
+# Shared connection pool settings for every DataRetriever
+MONGO_CLIENT_OPTIONS = {
+    'maxPoolSize': 50,
+    'compressors': ['zstd', 'zlib'] if HAS_ZSTD else ['zlib']
+}
+
+# Concurrent MongoDB round trips per process (well under maxPoolSize, so each
+# worker can hold its own pooled connection)
+MONGO_IO_WORKERS = 16
+
+# Date field each collection is range-filtered on (indexed ascending at startup)
+DATE_FIELDS = {
+    'Field': 'Date',
+    'Manufacturing': 'timestamp',
+    'Sales': 'timestamp',
+    'Testing': 'timestamp'
+}
+
+# Sales profit is not stored: it is derived from revenue at a flat margin
+PROFIT_MARGIN = 0.40
+
+# pymongoarrow is optional: decodes BSON straight into Arrow columns when installed
+HAS_PYMONGOARROW = False
+try:
+    from pymongoarrow.api import aggregate_arrow_all, find_arrow_all
+    HAS_PYMONGOARROW = True
+except Exception:
+    HAS_PYMONGOARROW = False
+
+# pyarrow is optional: Arrow-backed strings with NaN (not pd.NA) missing values,
+# matching pandas 3's default str dtype so numeric coercion downstream keeps plain
+# NumPy dtypes; without it text columns stay object dtype
+HAS_ARROW_STRINGS = False
+try:
+    import pyarrow  # noqa: F401
+    try:
+        ARROW_STRING_DTYPE = pd.StringDtype('pyarrow', na_value=float('nan'))  # pandas >= 2.3
+    except TypeError:
+        ARROW_STRING_DTYPE = 'string[pyarrow_numpy]'
+    HAS_ARROW_STRINGS = True
+except ImportError:
+    HAS_ARROW_STRINGS = False
 
 
 class DataRetriever:
@@ -16,8 +71,14 @@ class DataRetriever:
     Maps disparate MongoDB collection schemas to unified analysis-ready format
     """
 
-    def __init__(self):
-        """Initialize MongoDB connection using Streamlit secrets or environment variables"""
+    def __init__(self, client=None):
+        """
+        Initialize MongoDB connection using Streamlit secrets or environment variables
+
+        Args:
+            client: Existing MongoClient to reuse (optional, defaults to the
+                process-wide client from get_mongo_client)
+        """
         try:
             # Try Streamlit secrets first (for deployment)
             if hasattr(st, 'secrets') and 'mongodb' in st.secrets:
@@ -28,16 +89,54 @@ class DataRetriever:
                 mongo_uri = os.getenv('MONGODB_URI')
                 db_name = os.getenv('MONGODB_DATABASE', 'ai_cdp')
 
-            self.client = MongoClient(mongo_uri)
+            # Only a client handed in is this retriever's to close; the shared one serves
+            # every session for the life of the process
+            self._owns_client = client is not None
+            if client is not None:
+                self.client = client
+                # Test connection
+                self.client.admin.command('ping')
+            else:
+                # The shared client was pinged once, when it was first created
+                self.client = get_mongo_client(mongo_uri)
             self.db = self.client[db_name]
 
-            # Test connection
-            self.client.admin.command('ping')
+            self.date_index_hints = self._ensure_date_indexes()
+
+            # Long-lived workers for _run_concurrently (the retriever is a cached resource,
+            # so page loads reuse these threads instead of spawning a pool per call)
+            self._io_pool = ThreadPoolExecutor(max_workers=MONGO_IO_WORKERS, thread_name_prefix='mongo-io')
 
         except Exception as e:
             st.error(f"MongoDB Connection Error: {str(e)}")
             raise
 
+    def _ensure_date_indexes(self):
+        """
+        Create ascending indexes on each collection's date field (idempotent)
+
+        Returns:
+            Mapping of collection name -> index key spec usable as a query hint
+            (collections whose index could not be created are left out)
+        """
+        hints = {}
+        for collection_name, date_field in DATE_FIELDS.items():
+            keys = [(date_field, 1)]
+            try:
+                self.db[collection_name].create_index(keys)
+                hints[collection_name] = keys
+            except Exception:
+                # Read-only users cannot create indexes; queries still run unhinted
+                pass
+        return hints
+
+    def _date_hint(self, collection_name, match):
+        """Query options hinting the date index when the filter ranges over the date field"""
+        hint = self.date_index_hints.get(collection_name)
+        if hint and DATE_FIELDS[collection_name] in match:
+            return {'hint': hint}
+        return {}
+
     def _convert_to_datetime(self, df, date_column):
         """
         Safely convert date/timestamp columns to pandas datetime
@@ -49,9 +148,10 @@ class DataRetriever:
         Returns:
             DataFrame with converted datetime column
         """
-        if date_column in df.columns:
+        # BSON dates already decode to datetime64; only strings need parsing
+        if date_column in df.columns and not pd.api.types.is_datetime64_any_dtype(df[date_column]):
             try:
-                df[date_column] = pd.to_datetime(df[date_column], errors='coerce')
+                df[date_column] = pd.to_datetime(df[date_column], errors='coerce', cache=True)
             except Exception:
                 pass
         return df
@@ -60,6 +160,10 @@ class DataRetriever:
         """
         Safely convert columns to numeric, filling NaN with 0
 
+        Columns already decoded as numbers (pymongoarrow's typed columns, or
+        BSON numbers through pymongo) skip the parse and are only filled when
+        they actually hold missing values.
+
         Args:
             df: DataFrame to process
             columns: List of column names to convert
@@ -68,8 +172,162 @@ class DataRetriever:
             DataFrame with converted numeric columns
         """
         for col in columns:
+            if col not in df.columns:
+                continue
+            if df[col].dtype.kind in 'iufb':
+                if df[col].hasnans:
+                    df[col] = df[col].fillna(0)
+                continue
+            df[col] = pd.to_numeric(df[col], errors='coerce').fillna(0)
+        return df
+
+    def _downcast_columns(self, df, integer_columns=(), category_columns=()):
+        """
+        Shrink column dtypes so aggregations stream fewer bytes
+
+        Whole-number counts are downcast to the narrowest integer type that
+        holds them; low-cardinality identifier columns become categories.
+        Monetary floats keep float64 so revenue totals stay exact to the cent.
+
+        Args:
+            df: DataFrame to process
+            integer_columns: Count columns to downcast (left as is when not whole numbers)
+            category_columns: Identifier columns to store as category
+
+        Returns:
+            DataFrame with downcast columns
+        """
+        for col in integer_columns:
             if col in df.columns:
-                df[col] = pd.to_numeric(df[col], errors='coerce').fillna(0)
+                df[col] = pd.to_numeric(df[col], downcast='integer')
+        for col in category_columns:
+            if col in df.columns:
+                df[col] = df[col].astype('category')
+        return df
+
+    def _categorize_text(self, df, max_unique_ratio=0.5):
+        """
+        Store repetitive text columns as categories
+
+        A text column with few distinct values relative to its length (status,
+        type, key and name columns) is held as small integer codes plus one
+        copy of each label; mostly-unique columns such as bill and test IDs
+        stay strings.
+
+        Args:
+            df: DataFrame to process
+            max_unique_ratio: Largest distinct/row ratio converted
+
+        Returns:
+            DataFrame with repetitive text columns as category
+        """
+        for col in df.select_dtypes(include='string').columns:
+            # Ratio over the rows that carry the column (merged domains leave the rest missing)
+            if df[col].nunique() <= df[col].count() * max_unique_ratio:
+                df[col] = df[col].astype('category')
+        return df
+
+    def _domain_labels(self, n_rows, domain):
+        """Constant domain label for n_rows rows, as a one-category categorical (an int8 code per row)"""
+        return pd.Categorical.from_codes(np.zeros(n_rows, dtype=np.int8), categories=[domain])
+
+    def _align_categories(self, frames):
+        """
+        Give each categorical column the same categories in every frame
+
+        pd.concat keeps a categorical column only when all pieces share one
+        dtype; aligning the (small) category sets up front lets the merged
+        frame keep its codes instead of falling back to strings that would
+        be hashed again. Columns that are not categorical everywhere they
+        occur are left alone.
+
+        Args:
+            frames: DataFrames about to be concatenated (updated in place)
+        """
+        columns = {}
+        for df in frames:
+            for col in df.columns:
+                columns.setdefault(col, []).append(df[col].dtype)
+        for col, dtypes in columns.items():
+            if len(dtypes) < 2 or not all(isinstance(dtype, pd.CategoricalDtype) for dtype in dtypes):
+                continue
+            categories = dtypes[0].categories
+            for dtype in dtypes[1:]:
+                categories = categories.union(dtype.categories)
+            for df in frames:
+                if col in df.columns:
+                    df[col] = df[col].cat.set_categories(categories)
+
+    def _run_concurrently(self, tasks):
+        """
+        Run independent MongoDB round trips on the retriever's shared thread pool
+
+        pymongo releases the GIL while waiting on the server, so wall-clock
+        time is roughly the slowest task instead of the sum of all of them.
+        Worker threads inherit the Streamlit script context so st.error
+        calls inside the getters still reach the page.
+
+        Args:
+            tasks: Mapping of result name -> (callable, args tuple)
+
+        Returns:
+            Dictionary of result name -> callable return value
+        """
+        ctx = get_script_run_ctx()
+
+        def run(fn, args):
+            if ctx is not None:
+                add_script_run_ctx(ctx=ctx)
+            return fn(*args)
+
+        futures = {name: self._io_pool.submit(run, fn, args) for name, (fn, args) in tasks.items()}
+        return {name: future.result() for name, future in futures.items()}
+
+    def _find_frame(self, collection_name, query):
+        """
+        Run a find query and load the matching documents into a DataFrame
+
+        With pymongoarrow the cursor is decoded directly into an Arrow table
+        (no per-row Python dicts); otherwise the documents are materialized
+        through pymongo. The MongoDB _id field is projected away server-side.
+
+        Args:
+            collection_name: MongoDB collection to query
+            query: Find filter document
+
+        Returns:
+            DataFrame of matching documents (empty when nothing matches)
+        """
+        collection = self.db[collection_name]
+        projection = {'_id': 0}
+        options = self._date_hint(collection_name, query)
+        if HAS_PYMONGOARROW:
+            df = find_arrow_all(collection, query, projection=projection, **options).to_pandas()
+        else:
+            df = pd.DataFrame(list(collection.find(query, projection, **options)))
+        return self._arrow_strings(df)
+
+    def _arrow_strings(self, df):
+        """
+        Store pure-text object columns as Arrow-backed strings
+
+        Arrow strings keep one contiguous buffer per column, so comparisons,
+        .str methods and factorize run in vectorized kernels instead of over
+        Python objects. Numeric and datetime columns are left as NumPy dtypes
+        for the array kernels; pandas 3 already infers Arrow strings, making
+        this a no-op there.
+
+        Args:
+            df: DataFrame to process
+
+        Returns:
+            DataFrame with text columns converted (unchanged without pyarrow)
+        """
+        if not HAS_ARROW_STRINGS:
+            return df
+        for col in df.select_dtypes(include='object').columns:
+            if pd.api.types.infer_dtype(df[col], skipna=True) == 'string':
+                df[col] = df[col].astype(ARROW_STRING_DTYPE)
         return df
 
     def get_field_data(self, start_date=None, end_date=None):
@@ -88,19 +346,11 @@ class DataRetriever:
             DataFrame with mapped Field data
         """
         try:
-            collection = self.db['Field']
-
-            # Build query filter
-            query = {}
-            if start_date and end_date:
-                query['Date'] = {
-                    '$gte': start_date,
-                    '$lte': end_date
-                }
+            # Build query filter (served from the date index)
+            query = self._date_range('Date', start_date, end_date)
 
             # Fetch data
-            cursor = collection.find(query)
-            df = pd.DataFrame(list(cursor))
+            df = self._find_frame('Field', query)
 
             if df.empty:
                 return pd.DataFrame()
@@ -122,8 +372,14 @@ class DataRetriever:
             ]
             df = self._safe_numeric_conversion(df, numeric_columns)
 
+            # Calculate days of stock left at the current consumption rate
+            if 'Inventory_Level' in df.columns and 'Daily_Consumption' in df.columns:
+                df['Days_to_Depletion'] = safe_ratio(df['Inventory_Level'], df['Daily_Consumption'])
+
+            df = self._downcast_columns(df, numeric_columns, ['Store_ID'])
+
             # Add domain identifier
-            df['domain'] = 'Field'
+            df['domain'] = self._domain_labels(len(df), 'Field')
 
             return df
 
@@ -148,19 +404,11 @@ class DataRetriever:
             DataFrame with mapped Manufacturing data
         """
         try:
-            collection = self.db['Manufacturing']
-
-            # Build query filter
-            query = {}
-            if start_date and end_date:
-                query['timestamp'] = {
-                    '$gte': start_date,
-                    '$lte': end_date
-                }
+            # Build query filter (served from the date index)
+            query = self._date_range('timestamp', start_date, end_date)
 
             # Fetch data
-            cursor = collection.find(query)
-            df = pd.DataFrame(list(cursor))
+            df = self._find_frame('Manufacturing', query)
 
             if df.empty:
                 return pd.DataFrame()
@@ -188,14 +436,12 @@ class DataRetriever:
 
             # Calculate defect rate
             if 'Quantity_Produced' in df.columns and 'Defects' in df.columns:
-                mask = df['Quantity_Produced'] > 0
-                df['Defect_Rate'] = 0
-                df.loc[mask, 'Defect_Rate'] = (
-                    df.loc[mask, 'Defects'] / df.loc[mask, 'Quantity_Produced'] * 100
-                )
+                df['Defect_Rate'] = safe_ratio(df['Defects'], df['Quantity_Produced'], 100.0)
+
+            df = self._downcast_columns(df, numeric_columns, ['Line_ID', 'SKU'])
 
             # Add domain identifier
-            df['domain'] = 'Manufacturing'
+            df['domain'] = self._domain_labels(len(df), 'Manufacturing')
 
             return df
 
@@ -208,7 +454,8 @@ class DataRetriever:
         Retrieve Sales data with proper schema mapping
 
         Schema Mapping:
-        - Total_Amount -> Revenue (unified revenue field)
+        - Total_Amount -> Revenue (unified revenue field; a stored Revenue
+          fills in for documents without Total_Amount)
         - timestamp remains timestamp
 
         Args:
@@ -219,19 +466,11 @@ class DataRetriever:
             DataFrame with mapped Sales data
         """
         try:
-            collection = self.db['Sales']
-
-            # Build query filter
-            query = {}
-            if start_date and end_date:
-                query['timestamp'] = {
-                    '$gte': start_date,
-                    '$lte': end_date
-                }
+            # Build query filter (served from the date index)
+            query = self._date_range('timestamp', start_date, end_date)
 
             # Fetch data
-            cursor = collection.find(query)
-            df = pd.DataFrame(list(cursor))
+            df = self._find_frame('Sales', query)
 
             if df.empty:
                 return pd.DataFrame()
@@ -240,13 +479,18 @@ class DataRetriever:
             if '_id' in df.columns:
                 df = df.drop('_id', axis=1)
 
-            # CRITICAL MAPPING: Total_Amount -> Revenue
-            if 'Total_Amount' in df.columns:
-                df['Revenue'] = df['Total_Amount']
-
             # Convert timestamp
             df = self._convert_to_datetime(df, 'timestamp')
 
+            # CRITICAL MAPPING: Total_Amount -> Revenue, per document like the $ifNull in
+            # get_home_kpis: a document without an amount keeps its stored Revenue (before
+            # conversion, which would turn the missing amount into 0)
+            if 'Total_Amount' in df.columns:
+                if 'Revenue' in df.columns:
+                    df['Revenue'] = df['Total_Amount'].fillna(df['Revenue'])
+                else:
+                    df['Revenue'] = df['Total_Amount']
+
             # Ensure numeric conversions
             numeric_columns = [
                 'Revenue',
@@ -255,12 +499,14 @@ class DataRetriever:
             ]
             df = self._safe_numeric_conversion(df, numeric_columns)
 
-            # Calculate profit (40% margin)
+            # Calculate profit once at ingest (flat margin)
             if 'Revenue' in df.columns:
-                df['Profit'] = df['Revenue'] * 0.40
+                df['Profit'] = df['Revenue'] * PROFIT_MARGIN
+
+            df = self._downcast_columns(df, ['Quantity'], ['SKU'])
 
             # Add domain identifier
-            df['domain'] = 'Sales'
+            df['domain'] = self._domain_labels(len(df), 'Sales')
 
             return df
 
@@ -284,19 +530,11 @@ class DataRetriever:
             DataFrame with mapped Testing data
         """
         try:
-            collection = self.db['Testing']
-
-            # Build query filter
-            query = {}
-            if start_date and end_date:
-                query['timestamp'] = {
-                    '$gte': start_date,
-                    '$lte': end_date
-                }
+            # Build query filter (served from the date index)
+            query = self._date_range('timestamp', start_date, end_date)
 
             # Fetch data
-            cursor = collection.find(query)
-            df = pd.DataFrame(list(cursor))
+            df = self._find_frame('Testing', query)
 
             if df.empty:
                 return pd.DataFrame()
@@ -307,13 +545,14 @@ class DataRetriever:
 
             # CRITICAL MAPPING: Passed/Failed -> Pass_Fail_Status
             if 'Passed/Failed' in df.columns:
-                df['Pass_Fail_Status'] = df['Passed/Failed']
+                # A handful of distinct values: keep them as category codes
+                df['Pass_Fail_Status'] = df['Passed/Failed'].astype('category')
 
             # Convert timestamp
             df = self._convert_to_datetime(df, 'timestamp')
 
             # Add domain identifier
-            df['domain'] = 'Testing'
+            df['domain'] = self._domain_labels(len(df), 'Testing')
 
             return df
 
@@ -335,31 +574,25 @@ class DataRetriever:
             Single unified DataFrame with all data and proper schema mapping
         """
         try:
-            # Fetch all domain data
-            sales_df = self.get_sales_data(start_date, end_date)
-            manufacturing_df = self.get_manufacturing_data(start_date, end_date)
-            testing_df = self.get_testing_data(start_date, end_date)
-            field_df = self.get_field_data(start_date, end_date)
-
-            # Combine all DataFrames
-            all_dfs = []
-            
-            if not sales_df.empty:
-                all_dfs.append(sales_df)
-            if not manufacturing_df.empty:
-                all_dfs.append(manufacturing_df)
-            if not testing_df.empty:
-                all_dfs.append(testing_df)
-            if not field_df.empty:
-                all_dfs.append(field_df)
+            # Fetch all domain data concurrently
+            domain_data = self.get_all_data(start_date, end_date)
+
+            # Combine all DataFrames (sales, manufacturing, testing, field order)
+            all_dfs = [
+                domain_data[name] for name in ('sales', 'manufacturing', 'testing', 'field')
+                if not domain_data[name].empty
+            ]
 
             if not all_dfs:
                 return pd.DataFrame()
 
-            # Concatenate all data
+            # Concatenate all data (shared key columns keep their category codes)
+            self._align_categories(all_dfs)
             unified_df = pd.concat(all_dfs, ignore_index=True, sort=False)
 
-            return unified_df
+            # Remaining repetitive text columns become categories on the merged frame,
+            # which the chat filters and groups on
+            return self._categorize_text(unified_df)
             
         except Exception as e:
             st.error(f"Error in fetch_all_data: {str(e)}")
@@ -369,6 +602,8 @@ class DataRetriever:
         """
         Retrieve all domain data as separate DataFrames (legacy method for compatibility)
 
+        The four collection queries are issued concurrently.
+
         Args:
             start_date: Start date for filtering (optional)
             end_date: End date for filtering (optional)
@@ -376,14 +611,285 @@ class DataRetriever:
         Returns:
             Dictionary containing all mapped DataFrames
         """
-        return {
-            'field': self.get_field_data(start_date, end_date),
-            'manufacturing': self.get_manufacturing_data(start_date, end_date),
-            'sales': self.get_sales_data(start_date, end_date),
-            'testing': self.get_testing_data(start_date, end_date)
-        }
+        args = (start_date, end_date)
+        return self._run_concurrently({
+            'field': (self.get_field_data, args),
+            'manufacturing': (self.get_manufacturing_data, args),
+            'sales': (self.get_sales_data, args),
+            'testing': (self.get_testing_data, args)
+        })
+
+    def _numeric_expr(self, field, fallback=None):
+        """
+        Aggregation expression mirroring _safe_numeric_conversion
+
+        Args:
+            field: Source document field name
+            fallback: Field read instead when field is missing or null (optional)
+
+        Returns:
+            $convert expression casting the field to double (invalid/missing -> 0)
+        """
+        source = {'$ifNull': [f'${field}', f'${fallback}']} if fallback else f'${field}'
+        return {'$convert': {'input': source, 'to': 'double', 'onError': 0, 'onNull': 0}}
+
+    def _date_range(self, date_field, start_date=None, end_date=None):
+        """Build the filter document for a date range; either bound may be omitted (empty when unbounded)"""
+        bounds = {}
+        if start_date:
+            bounds['$gte'] = start_date
+        if end_date:
+            bounds['$lte'] = end_date
+        return {date_field: bounds} if bounds else {}
+
+    def _date_match(self, date_field, start_date=None, end_date=None):
+        """Build the leading $match stage for a date range (empty when unbounded)"""
+        match = self._date_range(date_field, start_date, end_date)
+        return [{'$match': match}] if match else []
+
+    def _pipeline_hint(self, collection_name, pipeline):
+        """Aggregate options hinting the date index when the pipeline opens with a date $match"""
+        if pipeline and '$match' in pipeline[0]:
+            return self._date_hint(collection_name, pipeline[0]['$match'])
+        return {}
+
+    def _aggregate_totals(self, collection_name, date_field, sums, start_date=None, end_date=None):
+        """
+        Aggregate collection-wide sums server-side
+
+        Args:
+            collection_name: MongoDB collection to aggregate
+            date_field: Date field used for range filtering
+            sums: Mapping of output name -> $sum operand expression
+            start_date: Start date for filtering (optional)
+            end_date: End date for filtering (optional)
+
+        Returns:
+            Dictionary of totals (zeros when no documents match)
+        """
+        pipeline = self._date_match(date_field, start_date, end_date) + [
+            {'$group': {'_id': None, **{name: {'$sum': expr} for name, expr in sums.items()}}}
+        ]
+        docs = list(self.db[collection_name].aggregate(pipeline, **self._pipeline_hint(collection_name, pipeline)))
+        if not docs:
+            return {name: 0 for name in sums}
+        return {name: docs[0].get(name, 0) for name in sums}
+
+    def _aggregate_frame(self, collection_name, pipeline):
+        """Run an aggregation pipeline and return its documents as a DataFrame (None when empty)"""
+        collection = self.db[collection_name]
+        options = self._pipeline_hint(collection_name, pipeline)
+        if HAS_PYMONGOARROW:
+            table = aggregate_arrow_all(collection, pipeline, **options)
+            return table.to_pandas() if table.num_rows else None
+        docs = list(collection.aggregate(pipeline, **options))
+        return pd.DataFrame(docs) if docs else None
+
+    def _rate_expr(self, numerator, denominator, scale=100):
+        """Aggregation expression for numerator / denominator * scale (0 when denominator <= 0)"""
+        return {'$cond': [
+            {'$gt': [f'${denominator}', 0]},
+            {'$multiply': [{'$divide': [f'${numerator}', f'${denominator}']}, scale]},
+            0
+        ]}
+
+    def get_daily_trend(self, collection_name, date_field, metrics, start_date=None, end_date=None, derived=None):
+        """
+        Aggregate per-day sums server-side
+
+        Args:
+            collection_name: MongoDB collection to aggregate
+            date_field: Date field used for range filtering and day bucketing
+            metrics: Mapping of output column -> source field to sum, or a
+                (field, fallback field) pair
+            start_date: Start date for filtering (optional)
+            end_date: End date for filtering (optional)
+            derived: Mapping of extra column -> expression over the daily sums (optional)
+
+        Returns:
+            DataFrame with a 'Date' column plus one column per metric, sorted by date
+            (None when no documents match)
+        """
+        pipeline = self._date_match(date_field, start_date, end_date) + [
+            {'$group': {
+                '_id': {'$dateTrunc': {'date': f'${date_field}', 'unit': 'day'}},
+                **{
+                    col: {'$sum': self._numeric_expr(*src) if isinstance(src, tuple) else self._numeric_expr(src)}
+                    for col, src in metrics.items()
+                }
+            }},
+            {'$match': {'_id': {'$ne': None}}},
+            {'$sort': {'_id': 1}}
+        ]
+        if derived:
+            pipeline.append({'$addFields': derived})
+        df = self._aggregate_frame(collection_name, pipeline)
+        if df is None:
+            return None
+        return df.rename(columns={'_id': 'Date'})
+
+    def get_home_kpis(self, start_date=None, end_date=None):
+        """
+        Compute the Home dashboard KPIs with MongoDB aggregation pipelines
+
+        Only scalars and small per-day / per-key frames cross the wire; the
+        result has the same keys as AIEngine.run_all_analyses, with None in
+        place of frames that have no rows. Revenue falls back to a stored
+        Revenue field in documents without Total_Amount, as in get_sales_data.
+
+        Args:
+            start_date: Start date for filtering (optional)
+            end_date: End date for filtering (optional)
+
+        Returns:
+            Dictionary with 'sales', 'quality', 'inventory' and 'testing' results
+        """
+        try:
+            dates = (start_date, end_date)
+
+            # Sales: Total_Amount (else a stored Revenue) -> Revenue, Profit at the flat margin
+            revenue_expr = self._numeric_expr('Total_Amount', 'Revenue')
+            profit_expr = {'$multiply': ['$Revenue', PROFIT_MARGIN]}
+            top_products_pipeline = self._date_match('timestamp', start_date, end_date) + [
+                {'$group': {
+                    '_id': '$SKU',
+                    'Revenue': {'$sum': revenue_expr},
+                    'Quantity': {'$sum': self._numeric_expr('Quantity')}
+                }},
+                {'$match': {'_id': {'$ne': None}}},
+                {'$sort': {'Revenue': -1}},
+                {'$limit': 10},
+                {'$project': {'_id': 0, 'SKU': '$_id', 'Revenue': 1, 'Quantity': 1, 'Profit': profit_expr}}
+            ]
+
+            # Manufacturing: Machine_ID -> Line_ID
+            mfg_sums = {
+                'Quantity_Produced': self._numeric_expr('Quantity_Produced'),
+                'Defects': self._numeric_expr('Defects')
+            }
+            line_performance_pipeline = self._date_match('timestamp', start_date, end_date) + [
+                {'$group': {'_id': '$Machine_ID', **{col: {'$sum': expr} for col, expr in mfg_sums.items()}}},
+                {'$match': {'_id': {'$ne': None}}},
+                {'$project': {
+                    '_id': 0, 'Line_ID': '$_id', 'Quantity_Produced': 1, 'Defects': 1,
+                    'Defect_Rate': self._rate_expr('Defects', 'Quantity_Produced')
+                }},
+                {'$sort': {'Defect_Rate': -1}}
+            ]
+
+            # Every round trip is independent: issue them all at once
+            results = self._run_concurrently({
+                'sales_totals': (self._aggregate_totals, (
+                    'Sales', 'timestamp', {'Revenue': revenue_expr}, *dates
+                )),
+                'revenue_trend': (self.get_daily_trend, (
+                    'Sales', 'timestamp', {'Revenue': ('Total_Amount', 'Revenue')}, *dates, {'Profit': profit_expr}
+                )),
+                'top_products': (self._aggregate_frame, ('Sales', top_products_pipeline)),
+                'mfg_totals': (self._aggregate_totals, ('Manufacturing', 'timestamp', mfg_sums, *dates)),
+                'defect_trend': (self.get_daily_trend, (
+                    'Manufacturing', 'timestamp',
+                    {'Quantity_Produced': 'Quantity_Produced', 'Defects': 'Defects'},
+                    *dates, {'Defect_Rate': self._rate_expr('Defects', 'Quantity_Produced')}
+                )),
+                'line_performance': (self._aggregate_frame, ('Manufacturing', line_performance_pipeline)),
+                # Field: Date is the range/day-bucket field
+                'field_totals': (self._aggregate_totals, (
+                    'Field', 'Date',
+                    {
+                        'Inventory_Level': self._numeric_expr('Inventory_Level'),
+                        'Low_Stock_Alerts': self._numeric_expr('Low_Stock_Alerts')
+                    },
+                    *dates
+                )),
+                'inventory_trend': (self.get_daily_trend, (
+                    'Field', 'Date',
+                    {'Inventory_Level': 'Inventory_Level', 'Low_Stock_Alerts': 'Low_Stock_Alerts'},
+                    *dates
+                )),
+                # Testing: Passed/Failed -> Pass_Fail_Status
+                'test_totals': (self._aggregate_totals, (
+                    'Testing', 'timestamp',
+                    {
+                        'total_tests': 1,
+                        'failed_tests': {'$cond': [{'$eq': [{'$toLower': '$Passed/Failed'}, 'failed']}, 1, 0]}
+                    },
+                    *dates
+                ))
+            })
+
+            total_revenue = results['sales_totals']['Revenue']
+            revenue_trend = results['revenue_trend']
+            top_products = results['top_products']
+
+            total_produced = results['mfg_totals']['Quantity_Produced']
+            total_defects = results['mfg_totals']['Defects']
+            defect_trend = results['defect_trend']
+
+            line_performance = results['line_performance']
+            anomalies = []
+            if line_performance is not None:
+                anomalies = line_performance.loc[line_performance['Defect_Rate'] > 5, 'Line_ID'].tolist()
+
+            field_totals = results['field_totals']
+            inventory_trend = results['inventory_trend']
+
+            total_tests = results['test_totals']['total_tests']
+            failed_tests = results['test_totals']['failed_tests']
+
+            return {
+                'sales': {
+                    'total_revenue': total_revenue,
+                    'total_profit': total_revenue * PROFIT_MARGIN,
+                    'profit_margin': PROFIT_MARGIN * 100 if total_revenue > 0 else 0,
+                    'revenue_trend': revenue_trend,
+                    'top_products': top_products
+                },
+                'quality': {
+                    'avg_defect_rate': (total_defects / total_produced * 100) if total_produced > 0 else 0,
+                    'total_defects': total_defects,
+                    'total_produced': total_produced,
+                    'defect_trend': defect_trend,
+                    'line_performance': line_performance,
+                    'anomalies': anomalies
+                },
+                'inventory': {
+                    'total_inventory': field_totals['Inventory_Level'],
+                    'low_stock_alerts': field_totals['Low_Stock_Alerts'],
+                    'inventory_trend': inventory_trend
+                },
+                'testing': {
+                    'total_tests': total_tests,
+                    'pass_rate': ((total_tests - failed_tests) / total_tests * 100) if total_tests > 0 else 0,
+                    'failed_tests': failed_tests
+                }
+            }
+
+        except Exception as e:
+            st.error(f"Error computing Home KPIs: {str(e)}")
+            raise
 
     def close(self):
-        """Close MongoDB connection"""
-        if self.client:
-            self.client.close()
\ No newline at end of file
+        """
+        Release this retriever's I/O threads, and its MongoDB connection if it
+        was handed in (the shared client stays open)
+        """
+        # Idle workers exit now; reads already in flight finish in the background
+        self._io_pool.shutdown(wait=False)
+        if self._owns_client and self.client:
+            self.client.close()
+
+
+@st.cache_resource(show_spinner=False)
+def get_mongo_client(mongo_uri):
+    """Process-wide MongoClient (one connection pool and monitor set per URI), verified once"""
+    client = MongoClient(mongo_uri, **MONGO_CLIENT_OPTIONS)
+    # A failed ping raises, so an unreachable client is never cached
+    client.admin.command('ping')
+    return client
+
+
+@st.cache_resource(show_spinner=False)
+def get_data_retriever():
+    """Process-wide DataRetriever shared by every session"""
+    return DataRetriever()
@@ -0,0 +1,489 @@
+"""
+Fast array preparation helpers for AI-CDP
+Downsampling utilities and numeric kernels that keep chart payloads small
+before they reach Plotly (JIT-compiled with Numba when it is installed)
+"""
+
+import os
+import numpy as np
+import pandas as pd
+
+# Persist compiled kernels next to the app so restarts load them instead of
+# recompiling (override with NUMBA_CACHE_DIR, e.g. to a mounted volume)
+os.environ.setdefault(
+    'NUMBA_CACHE_DIR',
+    os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), '.numba_cache')
+)
+
+# Numba is optional: kernels fall back to plain NumPy execution without it
+HAS_NUMBA = False
+try:
+    from numba import njit
+    HAS_NUMBA = True
+except Exception:
+    HAS_NUMBA = False
+
+# numexpr is optional: fuses guarded ratio expressions into one multithreaded pass
+HAS_NUMEXPR = False
+try:
+    import numexpr
+    HAS_NUMEXPR = True
+except Exception:
+    HAS_NUMEXPR = False
+
+
+def _lttb_kernel(x, y, n_out):
+    """LTTB selection over float64 arrays (n_out must be in [3, len(x)))"""
+    n = x.shape[0]
+
+    # Edges of the n_out - 2 interior buckets spanning rows 1 .. n - 2
+    edges = np.linspace(1, n - 1, n_out - 1).astype(np.int64)
+    selected = np.empty(n_out, dtype=np.int64)
+    selected[0] = 0
+    selected[-1] = n - 1
+
+    a = 0
+    for i in range(n_out - 2):
+        start, end = edges[i], edges[i + 1]
+        next_end = edges[i + 2] if i + 2 < len(edges) else n
+        avg_x = x[end:next_end].mean()
+        avg_y = y[end:next_end].mean()
+
+        area = np.abs(
+            (x[a] - avg_x) * (y[start:end] - y[a])
+            - (x[a] - x[start:end]) * (avg_y - y[a])
+        )
+        a = start + int(np.argmax(area))
+        selected[i + 1] = a
+
+    return selected
+
+
+if HAS_NUMBA:
+    _lttb_kernel = njit(cache=True, fastmath=True)(_lttb_kernel)
+
+
+def _quality_kernel(qty, defects, codes, n_groups):
+    """Fused pass: overall and per-group sums of produced quantity and defects"""
+    line_qty = np.zeros(n_groups, dtype=np.float64)
+    line_defects = np.zeros(n_groups, dtype=np.float64)
+    total_qty = 0.0
+    total_defects = 0.0
+    for i in range(qty.shape[0]):
+        total_qty += qty[i]
+        total_defects += defects[i]
+        code = codes[i]
+        if code >= 0:
+            line_qty[code] += qty[i]
+            line_defects[code] += defects[i]
+    return total_qty, total_defects, line_qty, line_defects
+
+
+if HAS_NUMBA:
+    _quality_kernel = njit(cache=True)(_quality_kernel)
+
+
+def quality_reduce(qty, defects, codes, n_groups):
+    """
+    Reduce manufacturing rows to overall and per-line production/defect sums
+
+    Args:
+        qty: float64 array of Quantity_Produced
+        defects: float64 array of Defects
+        codes: Integer group code per row from group_codes (-1 = missing key)
+        n_groups: Number of distinct group codes
+
+    Returns:
+        Tuple of (total_qty, total_defects, per_group_qty, per_group_defects)
+    """
+    codes = np.ascontiguousarray(codes, dtype=np.int64)
+    if HAS_NUMBA:
+        return _quality_kernel(qty, defects, codes, n_groups)
+
+    valid = codes >= 0
+    return (
+        qty.sum(),
+        defects.sum(),
+        np.bincount(codes[valid], weights=qty[valid], minlength=n_groups),
+        np.bincount(codes[valid], weights=defects[valid], minlength=n_groups)
+    )
+
+
+def _ratio_kernel(num, den, scale, out):
+    """Guarded elementwise num / den * scale into out (0.0 where den is not positive)"""
+    for i in range(num.shape[0]):
+        d = den[i]
+        out[i] = num[i] / d * scale if d > 0 else 0.0
+    return out
+
+
+# Serial on purpose: Streamlit runs each session's script on its own thread, so the
+# shared engine can call kernels from several threads at once, which Numba's
+# default (workqueue) parallel backend does not support
+if HAS_NUMBA:
+    _ratio_kernel = njit(cache=True)(_ratio_kernel)
+
+
+def warm_kernels():
+    """
+    Compile (or load from the on-disk cache) every kernel on a tiny input
+
+    Call once per process so the first dashboard refresh does not pay the
+    JIT cost. A no-op beyond a few array operations without Numba.
+
+    Returns:
+        True when the kernels are JIT-compiled, False on the NumPy fallback
+    """
+    dummy = np.arange(4, dtype=np.float64)
+    _lttb_kernel(dummy, dummy, 3)
+    quality_reduce(dummy, dummy, np.zeros(4, dtype=np.int64), 1)
+    safe_ratio(dummy, dummy)
+    _binned_sum(np.zeros(4, dtype=np.int64), dummy, 1)
+    _group_mean_kernel(np.zeros(4, dtype=np.int64), dummy, 1)
+    return HAS_NUMBA
+
+
+def safe_ratio(num, den, scale=1.0):
+    """
+    Elementwise num / den * scale, with 0.0 wherever den is not positive
+
+    With Numba (or else numexpr) the guard, divide and scale run as one fused
+    pass; the NumPy fallback divides under the guard and scales in place.
+
+    Args:
+        num: Numerator array-like
+        den: Denominator array-like
+        scale: Constant factor applied to each ratio (e.g. 100 for percentages)
+
+    Returns:
+        float64 NumPy array
+    """
+    num = np.asarray(num, dtype=np.float64)
+    den = np.asarray(den, dtype=np.float64)
+    if HAS_NUMBA:
+        return _ratio_kernel(num, den, float(scale), np.empty_like(num))
+    if HAS_NUMEXPR:
+        return numexpr.evaluate(
+            'where(den > 0, num / den * scale, 0.0)',
+            local_dict={'num': num, 'den': den, 'scale': float(scale)}
+        )
+    out = np.divide(num, den, out=np.zeros_like(num), where=den > 0)
+    if scale != 1.0:
+        out *= scale
+    return out
+
+
+def status_mask(status, value):
+    """
+    Boolean mask of rows whose status equals value case-insensitively
+
+    Only the distinct statuses are lowercased and rows are matched through
+    their integer codes (the categorical codes when the column is already a
+    category, pd.factorize otherwise), avoiding a per-row .str.lower().
+
+    Args:
+        status: Series of status strings (object, string or category dtype)
+        value: Lowercase status to match (e.g. 'failed')
+
+    Returns:
+        Boolean NumPy array aligned with status
+    """
+    if isinstance(status.dtype, pd.CategoricalDtype):
+        codes, uniques = status.cat.codes.to_numpy(), status.cat.categories
+    else:
+        codes, uniques = pd.factorize(status, sort=False)
+    # Trailing False catches code -1 (missing status)
+    hits = np.append(pd.Index(uniques).str.lower() == value, False)
+    return hits[codes]
+
+
+def status_count(status, value):
+    """
+    Number of rows whose status equals value case-insensitively
+
+    Counts rows per code (one bincount over the category codes, or the
+    factorized codes otherwise) and adds up the codes whose label matches,
+    without materializing a row-length mask.
+
+    Args:
+        status: Series of status strings (object, string or category dtype)
+        value: Lowercase status to match (e.g. 'failed')
+
+    Returns:
+        int count
+    """
+    codes, uniques = group_codes(status)
+    counts = np.bincount(codes + 1, minlength=len(uniques) + 1)[1:]  # slot 0: missing status
+    return int(counts[pd.Index(uniques).str.lower() == value].sum())
+
+
+def day_bucket(ts):
+    """
+    Truncate timestamps to calendar days as a datetime64 array
+
+    Grouping on datetime64 days hashes int64 values instead of the Python
+    date objects produced by .dt.date.
+
+    Args:
+        ts: Series (or array-like) of timestamps or date strings
+
+    Returns:
+        datetime64[D] NumPy array (NaT for unparseable values)
+    """
+    if isinstance(getattr(ts, 'dtype', None), pd.DatetimeTZDtype):
+        # Wall-clock values, so days are local calendar days (as .dt.date gives) rather
+        # than UTC ones, without a pass through pd.to_datetime
+        ts = pd.Series(ts).dt.tz_localize(None)
+    if pd.api.types.is_datetime64_dtype(ts):
+        # Already normalized at ingest: truncate the raw datetime64 values directly
+        return np.asarray(ts).astype('datetime64[D]')
+    return pd.to_datetime(ts, errors='coerce', cache=True).values.astype('datetime64[D]')
+
+
+def daily_sums(ts, columns):
+    """
+    Sum several columns per calendar day in one columnar pass
+
+    Days are consecutive integers, so each row's offset from the first day
+    is already its group id: every column is reduced in one pass over those
+    ids instead of a hashed groupby (sparse, very wide date spans fall back
+    to factorize).
+
+    Args:
+        ts: Series of timestamps
+        columns: Mapping of output name -> Series (or array) of numeric values
+
+    Returns:
+        DataFrame with 'Date' and one summed column per input, ascending by
+        Date; days without rows and rows without a timestamp are omitted
+    """
+    days = day_bucket(ts).view(np.int64)
+    valid = days != np.iinfo(np.int64).min  # NaT
+    days = days[valid]
+    if days.size == 0:
+        return pd.DataFrame({'Date': np.array([], dtype='datetime64[D]'), **{name: [] for name in columns}})
+
+    first = days.min()
+    span = int(days.max() - first) + 1
+    if span <= 4 * days.size + 1024:
+        codes, keys = days - first, first + np.arange(span)
+    else:
+        codes, keys = pd.factorize(days, sort=True)
+    present = np.bincount(codes, minlength=len(keys)) > 0
+
+    result = {'Date': keys[present].astype('datetime64[D]')}
+    for name, values in columns.items():
+        result[name] = _binned_sum(codes, np.asarray(values)[valid], len(keys))[present]
+    return pd.DataFrame(result)
+
+
+def _group_sum_kernel(codes, values, n_groups):
+    """One pass of per-group sums by code, skipping code -1 (missing key) and NaN values"""
+    out = np.zeros(n_groups, dtype=np.float64)
+    for i in range(codes.shape[0]):
+        code = codes[i]
+        value = values[i]
+        if code >= 0 and value == value:
+            out[code] += value
+    return out
+
+
+if HAS_NUMBA:
+    _group_sum_kernel = njit(cache=True)(_group_sum_kernel)
+
+
+def _binned_sum(codes, values, n_groups):
+    """Group sums of values by code (-1 = skipped row), keeping integer dtypes"""
+    if HAS_NUMBA:
+        # Numeric columns are read in their own dtype: no float64 or NaN-scrubbed copy
+        if values.dtype.kind not in 'iufb':
+            values = values.astype(np.float64)
+        sums = _group_sum_kernel(codes, values, n_groups)
+    else:
+        valid = codes >= 0
+        if not valid.all():
+            codes, values = codes[valid], values[valid]
+        weights = np.nan_to_num(values.astype(np.float64, copy=False))  # sum skips missing values
+        sums = np.bincount(codes, weights=weights, minlength=n_groups)
+    # Integer (and boolean flag) columns sum to int64, as with groupby, so downcast
+    # inputs cannot overflow (exact below 2**53)
+    if values.dtype.kind in 'iub':
+        return sums.astype(np.int64)
+    return sums
+
+
+def group_codes(keys):
+    """
+    Integer group code per row and the distinct keys the codes index
+
+    Categorical keys reuse their stored codes (only categories that occur
+    are kept) instead of re-hashing every row with pd.factorize.
+
+    Args:
+        keys: Series of group keys
+
+    Returns:
+        Tuple of (codes array with -1 for a missing key, distinct keys)
+    """
+    if not isinstance(keys.dtype, pd.CategoricalDtype):
+        return pd.factorize(keys, sort=False)
+
+    codes = keys.cat.codes.to_numpy()
+    categories = keys.cat.categories
+    # Occurrences per category (slot 0 counts the missing keys, code -1)
+    present = np.bincount(codes + 1, minlength=len(categories) + 1)[1:] > 0
+    if present.all():
+        return codes, categories
+    # Renumber the occurring categories 0..k-1; the trailing -1 keeps missing keys missing
+    remap = np.append(np.where(present, np.cumsum(present) - 1, -1), -1)
+    return remap[codes], categories[present]
+
+
+def group_sums(keys, columns):
+    """
+    Sum several columns per distinct key in one factorize + bincount pass
+
+    Replaces groupby(key)[cols].sum() for plain numeric sums: the keys are
+    coded once (see group_codes) and each column is a single pass over the
+    codes (a Numba kernel when available, np.bincount otherwise).
+
+    Args:
+        keys: Series of group keys (rows with a missing key are dropped)
+        columns: Mapping of output name -> Series (or array) of numeric values
+
+    Returns:
+        Tuple of (distinct keys, dict of output name -> per-key sums
+        aligned with those keys)
+    """
+    codes, uniques = group_codes(keys)
+    sums = {name: _binned_sum(codes, np.asarray(values), len(uniques)) for name, values in columns.items()}
+    return uniques, sums
+
+
+def _group_mean_kernel(codes, values, n_groups):
+    """One pass of per-group sums and counts by code, skipping code -1 (missing key) and NaN values"""
+    sums = np.zeros(n_groups, dtype=np.float64)
+    counts = np.zeros(n_groups, dtype=np.int64)
+    for i in range(codes.shape[0]):
+        code = codes[i]
+        value = values[i]
+        if code >= 0 and value == value:
+            sums[code] += value
+            counts[code] += 1
+    return sums, counts
+
+
+if HAS_NUMBA:
+    _group_mean_kernel = njit(cache=True)(_group_mean_kernel)
+
+
+def group_means(keys, values):
+    """
+    Mean of a column per distinct key, with sums and counts taken in one pass
+
+    Replaces groupby(key)[col].mean(): the keys are coded once (see
+    group_codes) and a single pass accumulates both the sum and the number
+    of non-missing values per key, instead of one sum pass plus a second
+    pass over a notna() mask.
+
+    Args:
+        keys: Series of group keys (rows with a missing key are dropped)
+        values: Series (or array) of numeric values; missing values are skipped
+
+    Returns:
+        Tuple of (distinct keys, per-key means, per-key counts of non-missing
+        values), aligned; the mean is NaN where a key has no values
+    """
+    codes, uniques = group_codes(keys)
+    values = np.asarray(values)
+    if values.dtype.kind not in 'iufb':
+        values = values.astype(np.float64)
+    n_groups = len(uniques)
+    if HAS_NUMBA:
+        sums, counts = _group_mean_kernel(codes, values, n_groups)
+    else:
+        values = values.astype(np.float64, copy=False)
+        valid = (codes >= 0) & ~np.isnan(values)
+        sums = np.bincount(codes[valid], weights=values[valid], minlength=n_groups)
+        counts = np.bincount(codes[valid], minlength=n_groups)
+    means = np.full(n_groups, np.nan)
+    np.divide(sums, counts, out=means, where=counts > 0)
+    return uniques, means, counts
+
+
+def top_k_indices(values, k):
+    """
+    Positions of the k largest values, largest first
+
+    np.argpartition selects the k candidates in O(n); only those k are then
+    sorted, instead of ordering every value.
+
+    Args:
+        values: 1-D numeric array (without NaN)
+        k: Number of positions to return (fewer when values is shorter)
+
+    Returns:
+        Integer array of at most k positions into values
+    """
+    values = np.asarray(values)
+    if k <= 0 or values.size == 0:
+        return np.empty(0, dtype=np.intp)
+    if k < values.size:
+        idx = np.sort(np.argpartition(-values, k - 1)[:k])  # ties then keep row order
+    else:
+        idx = np.arange(values.size)
+    return idx[np.argsort(-values[idx], kind='stable')]
+
+
+def lttb_indices(x, y, n_out):
+    """
+    Select representative points with Largest-Triangle-Three-Buckets (LTTB)
+
+    The first and last points are always kept; every interior bucket keeps
+    the point forming the largest triangle with the previously selected
+    point and the average of the next bucket.
+
+    Args:
+        x: 1-D array of x values (numeric or datetime64)
+        y: 1-D array of y values
+        n_out: Maximum number of points to keep
+
+    Returns:
+        Sorted integer array of selected row positions
+    """
+    n = len(x)
+    if n_out >= n or n_out < 3:
+        return np.arange(n)
+
+    x = np.asarray(x)
+    if np.issubdtype(x.dtype, np.datetime64):
+        x = x.astype('datetime64[ns]').view('i8')
+    x = np.ascontiguousarray(x, dtype=np.float64)
+    y = np.ascontiguousarray(y, dtype=np.float64)
+    return _lttb_kernel(x, y, n_out)
+
+
+def trend_arrays(df, x_col, y_col, n_out=500):
+    """
+    Extract downsampled (x, y) NumPy arrays for one chart trace
+
+    Args:
+        df: Trend DataFrame sorted by x_col (or None when there are no rows)
+        x_col: Column plotted on the x axis
+        y_col: Column plotted on the y axis
+        n_out: Maximum number of points to keep
+
+    Returns:
+        Tuple of (x, y) arrays (both empty when df is None or empty); text
+        labels come back as fixed-width strings so the arrays hash by content
+    """
+    if df is None or df.empty:
+        return np.array([]), np.array([], dtype=np.float64)
+    x = df[x_col].to_numpy()
+    if x.dtype == object:
+        x = x.astype(str)
+    y = df[y_col].to_numpy(dtype=np.float64)
+    if len(x) > n_out:
+        idx = lttb_indices(x, y, n_out)
+        x, y = x[idx], y[idx]
+    return x, y
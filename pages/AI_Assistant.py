@@ -9,8 +9,8 @@ import pandas as pd
 import plotly.express as px
 import plotly.graph_objects as go
 from datetime import datetime, timedelta
-from core_analysis.data_retriever import DataRetriever
-from core_analysis.ai_engine import AIEngine
+from core_analysis.data_retriever import get_data_retriever
+from core_analysis.ai_engine import get_ai_engine
 
 # Page configuration
 st.set_page_config(
@@ -232,11 +232,10 @@ st.markdown("""
 </style>
 """, unsafe_allow_html=True)
 
+# Shared engine (cached process-wide)
+ai_engine = get_ai_engine()
+
 # Initialize session state
-if 'data_retriever' not in st.session_state:
-    st.session_state.data_retriever = None
-if 'ai_engine' not in st.session_state:
-    st.session_state.ai_engine = AIEngine()
 if 'chat_history' not in st.session_state:
     st.session_state.chat_history = []
 if 'chat_full_df' not in st.session_state:
@@ -247,13 +246,17 @@ if 'data_loaded' not in st.session_state:
 def initialize_connections():
     """Initialize database connections"""
     try:
-        if st.session_state.data_retriever is None:
-            st.session_state.data_retriever = DataRetriever()
+        get_data_retriever()
         return True
     except Exception as e:
         st.error(f"Failed to connect to database: {str(e)}")
         return False
 
+@st.cache_data(ttl=300, show_spinner=False, max_entries=8)
+def load_all_data(_data_retriever, start_date, end_date):
+    """Merged rows of every collection for a date range (cached per range, so repeated loads skip MongoDB)"""
+    return _data_retriever.fetch_all_data(start_date, end_date)
+
 def render_chat_message(message, is_user=True):
     """Render a single chat message with timestamp"""
     timestamp = message.get('timestamp', datetime.now()).strftime('%I:%M %p')
@@ -273,6 +276,33 @@ def render_chat_message(message, is_user=True):
         </div>
         """, unsafe_allow_html=True)
 
+@st.cache_resource(show_spinner=False, max_entries=64)
+def build_chat_chart(chart):
+    """Build the Plotly figure for an AI chart spec (memoized per spec)"""
+    if chart['kind'] == 'pie':
+        fig = go.Figure(go.Pie(
+            labels=chart['names'],
+            values=chart['values'],
+            hole=chart.get('hole'),
+            marker=dict(colors=chart.get('colors'))
+        ))
+    else:
+        if chart['kind'] == 'line':
+            trace = go.Scatter(x=chart['x'], y=chart['y'], mode='lines', line=dict(color=chart.get('color')))
+        elif 'color_scale' in chart:
+            # Bars shaded by their own value
+            trace = go.Bar(x=chart['x'], y=chart['y'], marker=dict(
+                color=chart['y'], colorscale=chart['color_scale'], showscale=True,
+                colorbar=dict(title=chart['y_title'])
+            ))
+        else:
+            trace = go.Bar(x=chart['x'], y=chart['y'], marker_color=chart.get('color'))
+        fig = go.Figure(trace)
+        fig.update_layout(xaxis_title=chart['x_title'], yaxis_title=chart['y_title'])
+    
+    fig.update_layout(title=chart['title'], margin=dict(l=20, r=20, t=40, b=20))
+    return fig
+
 # Main content
 st.title("🤖 AI Analysis Assistant")
 st.markdown('<div class="ai-badge">✨ Powered by Google Gemini AI</div>', unsafe_allow_html=True)
@@ -303,13 +333,17 @@ with st.sidebar:
                             start_date = end_date - timedelta(days=30)
                         
                         # Fetch all data from all collections
-                        st.session_state.chat_full_df = st.session_state.data_retriever.fetch_all_data(
-                            start_date, end_date
-                        )
+                        st.session_state.chat_full_df = load_all_data(get_data_retriever(), start_date, end_date)
                         
                         if st.session_state.chat_full_df is not None and not st.session_state.chat_full_df.empty:
                             st.session_state.data_loaded = True
                             
+                            # Domain breakdown counted once per load (the sidebar shows it on every rerun)
+                            if 'domain' in st.session_state.chat_full_df.columns:
+                                st.session_state.chat_domain_counts = st.session_state.chat_full_df['domain'].value_counts()
+                            else:
+                                st.session_state.chat_domain_counts = None
+                            
                             # Add welcome message
                             st.session_state.chat_history = [{
                                 'type': 'assistant',
@@ -347,6 +381,7 @@ with st.sidebar:
         if st.button("🗑️ Clear", use_container_width=True):
             st.session_state.chat_history = []
             st.session_state.chat_full_df = None
+            st.session_state.chat_domain_counts = None
             st.session_state.data_loaded = False
             st.rerun()
     
@@ -359,8 +394,8 @@ with st.sidebar:
         st.markdown(f'<div class="connection-status status-connected">🟢 Connected | {records:,} records</div>', unsafe_allow_html=True)
         
         # Show data breakdown by domain
-        if 'domain' in st.session_state.chat_full_df.columns:
-            domain_counts = st.session_state.chat_full_df['domain'].value_counts()
+        domain_counts = st.session_state.get('chat_domain_counts')
+        if domain_counts is not None:
             st.markdown("#### Records by Domain:")
             for domain, count in domain_counts.items():
                 st.caption(f"• {domain}: {count:,}")
@@ -386,7 +421,7 @@ if st.session_state.chat_history:
         
         # Display chart if available
         if msg.get('chart') is not None:
-            st.plotly_chart(msg['chart'], use_container_width=True, key=f"chat_chart_{idx}")
+            st.plotly_chart(build_chat_chart(msg['chart']), use_container_width=True, key=f"chat_chart_{idx}")
 else:
     # Welcome screen
     st.markdown("""
@@ -472,7 +507,7 @@ if submit_button and user_input:
                         })
                 
                 # Call AI engine
-                response_text, fig = st.session_state.ai_engine.process_chat_query(
+                response_text, chart = ai_engine.process_chat_query(
                     user_input,
                     st.session_state.chat_full_df,
                     chat_context
@@ -483,7 +518,7 @@ if submit_button and user_input:
                     'type': 'assistant',
                     'text': response_text,
                     'timestamp': datetime.now(),
-                    'chart': fig
+                    'chart': chart
                 })
                 
             except Exception as e:
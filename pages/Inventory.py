@@ -5,11 +5,13 @@ Connected to 'Field' MongoDB collection
 
 import streamlit as st
 import pandas as pd
+import numpy as np
 import plotly.express as px
 import plotly.graph_objects as go
 from datetime import datetime, timedelta
-from core_analysis.data_retriever import DataRetriever
-from core_analysis.ai_engine import AIEngine
+from core_analysis.data_retriever import get_data_retriever
+from core_analysis.ai_engine import get_ai_engine
+from core_analysis.fastprep import daily_sums, day_bucket, group_means, top_k_indices
 
 # Page configuration
 st.set_page_config(
@@ -165,11 +167,10 @@ st.markdown("""
 </style>
 """, unsafe_allow_html=True)
 
+# Shared engine (cached process-wide)
+ai_engine = get_ai_engine()
+
 # Initialize session state
-if 'data_retriever' not in st.session_state:
-    st.session_state.data_retriever = None
-if 'ai_engine' not in st.session_state:
-    st.session_state.ai_engine = AIEngine()
 if 'inventory_data_loaded' not in st.session_state:
     st.session_state.inventory_data_loaded = False
 if 'inventory_data' not in st.session_state:
@@ -178,13 +179,17 @@ if 'inventory_data' not in st.session_state:
 def initialize_connections():
     """Initialize database connections"""
     try:
-        if st.session_state.data_retriever is None:
-            st.session_state.data_retriever = DataRetriever()
+        get_data_retriever()
         return True
     except Exception as e:
         st.error(f"Failed to connect to database: {str(e)}")
         return False
 
+@st.cache_data(ttl=300, show_spinner=False, max_entries=8)
+def load_field_data(_data_retriever, start_date, end_date):
+    """Field/inventory rows for a date range (cached per range, so repeated loads skip MongoDB)"""
+    return _data_retriever.get_field_data(start_date, end_date)
+
 # Main content
 st.title("📦 Inventory Management")
 st.markdown("##### Stock levels, low stock alerts, and consumption trends")
@@ -229,11 +234,11 @@ with st.sidebar:
                         start_date = end_date - timedelta(days=30)
                     
                     # Fetch Field data from 'Field' collection
-                    field_df = st.session_state.data_retriever.get_field_data(start_date, end_date)
+                    field_df = load_field_data(get_data_retriever(), start_date, end_date)
                     
                     if not field_df.empty:
                         # Analyze inventory data
-                        results = st.session_state.ai_engine.analyze_inventory(field_df)
+                        results = ai_engine.analyze_inventory(field_df)
                         
                         st.session_state.inventory_data = {
                             'df': field_df,
@@ -275,7 +280,7 @@ if st.session_state.inventory_data_loaded and st.session_state.inventory_data:
     
     # Recalculate results for filtered data
     if store_filter or show_low_stock_only:
-        results = st.session_state.ai_engine.analyze_inventory(filtered_df)
+        results = ai_engine.analyze_inventory(filtered_df)
     
     # KPI Row
     st.markdown("### 📈 Key Inventory Metrics")
@@ -292,7 +297,7 @@ if st.session_state.inventory_data_loaded and st.session_state.inventory_data:
         st.metric("Avg Days to Depletion", f"{avg_days:.1f}" if avg_days > 0 else "N/A")
     
     with kpi_cols[3]:
-        critical_stores = len(results['critical_stores'])
+        critical_stores = len(results['critical_stores']) if results['critical_stores'] is not None else 0
         st.metric("Critical Stores", f"{critical_stores}")
     
     # Inventory Status Alert
@@ -308,7 +313,7 @@ if st.session_state.inventory_data_loaded and st.session_state.inventory_data:
     
     # Inventory Trend
     st.markdown("### 📊 Inventory Level Trend")
-    if not results['inventory_trend'].empty:
+    if results['inventory_trend'] is not None:
         fig = px.area(
             results['inventory_trend'],
             x='Date',
@@ -338,8 +343,13 @@ if st.session_state.inventory_data_loaded and st.session_state.inventory_data:
     with col1:
         st.markdown("### 🏪 Top Stores by Inventory Level")
         if 'Store_ID' in filtered_df.columns and 'Inventory_Level' in filtered_df.columns:
-            store_inv = filtered_df.groupby('Store_ID')['Inventory_Level'].mean().reset_index()
-            store_inv = store_inv.sort_values('Inventory_Level', ascending=False).head(10)
+            # Per-store means in one pass over the store codes and a partial top-10 pick, built
+            # straight into the plotted frame (no groupby result to reset and re-index)
+            stores, store_mean, stocked_rows = group_means(filtered_df['Store_ID'], filtered_df['Inventory_Level'])
+            stocked = np.flatnonzero(stocked_rows > 0)
+            store_mean = store_mean[stocked]
+            top = top_k_indices(store_mean, 10)
+            store_inv = pd.DataFrame({'Store_ID': pd.Index(stores)[stocked[top]], 'Inventory_Level': store_mean[top]})
             
             fig = px.bar(
                 store_inv,
@@ -365,10 +375,7 @@ if st.session_state.inventory_data_loaded and st.session_state.inventory_data:
     with col2:
         st.markdown("### 📉 Daily Consumption Trend")
         if 'timestamp' in filtered_df.columns and 'Daily_Consumption' in filtered_df.columns:
-            cons_df = filtered_df.copy()
-            cons_df['Date'] = pd.to_datetime(cons_df['timestamp']).dt.date
-            daily_cons = cons_df.groupby('Date')['Daily_Consumption'].sum().reset_index()
-            daily_cons = daily_cons.sort_values('Date')
+            daily_cons = daily_sums(filtered_df['timestamp'], {'Daily_Consumption': filtered_df['Daily_Consumption']})
             
             fig = px.line(
                 daily_cons,
@@ -396,7 +403,7 @@ if st.session_state.inventory_data_loaded and st.session_state.inventory_data:
     st.markdown("---")
     st.markdown("### ⚠️ Critical Inventory Alerts")
     
-    if not results['critical_stores'].empty:
+    if results['critical_stores'] is not None:
         st.warning(f"**{len(results['critical_stores'])} stores** have less than 7 days of inventory remaining")
         
         col1, col2 = st.columns([2, 1])
@@ -446,7 +453,7 @@ if st.session_state.inventory_data_loaded and st.session_state.inventory_data:
         st.caption("No stores are critically low on inventory")
     
     # Low Stock Alerts Over Time
-    if not results['inventory_trend'].empty and 'Low_Stock_Alerts' in results['inventory_trend'].columns:
+    if results['inventory_trend'] is not None and 'Low_Stock_Alerts' in results['inventory_trend'].columns:
         st.markdown("---")
         st.markdown("### 📊 Low Stock Alerts Over Time")
         
@@ -475,9 +482,10 @@ if st.session_state.inventory_data_loaded and st.session_state.inventory_data:
         st.markdown("---")
         st.markdown("### 🗓️ Store Inventory Heatmap")
         
-        heatmap_df = filtered_df.copy()
-        heatmap_df['Date'] = pd.to_datetime(heatmap_df['timestamp']).dt.date
-        heatmap_pivot = heatmap_df.groupby(['Date', 'Store_ID'])['Inventory_Level'].mean().reset_index()
+        days = pd.Series(day_bucket(filtered_df['timestamp']), index=filtered_df.index, name='Date')
+        heatmap_pivot = filtered_df.groupby([days, 'Store_ID'], sort=False, observed=True, as_index=False).agg(
+            Inventory_Level=('Inventory_Level', 'mean')
+        )
         heatmap_pivot = heatmap_pivot.pivot(index='Store_ID', columns='Date', values='Inventory_Level').fillna(0)
         
         fig = px.imshow(
@@ -5,11 +5,13 @@ Connected to 'Manufacturing' MongoDB collection
 
 import streamlit as st
 import pandas as pd
+import numpy as np
 import plotly.express as px
 import plotly.graph_objects as go
 from datetime import datetime, timedelta
-from core_analysis.data_retriever import DataRetriever
-from core_analysis.ai_engine import AIEngine
+from core_analysis.data_retriever import get_data_retriever
+from core_analysis.ai_engine import get_ai_engine
+from core_analysis.fastprep import day_bucket
 
 # Page configuration
 st.set_page_config(
@@ -165,11 +167,10 @@ st.markdown("""
 </style>
 """, unsafe_allow_html=True)
 
+# Shared engine (cached process-wide)
+ai_engine = get_ai_engine()
+
 # Initialize session state
-if 'data_retriever' not in st.session_state:
-    st.session_state.data_retriever = None
-if 'ai_engine' not in st.session_state:
-    st.session_state.ai_engine = AIEngine()
 if 'manufacturing_data_loaded' not in st.session_state:
     st.session_state.manufacturing_data_loaded = False
 if 'manufacturing_data' not in st.session_state:
@@ -178,13 +179,17 @@ if 'manufacturing_data' not in st.session_state:
 def initialize_connections():
     """Initialize database connections"""
     try:
-        if st.session_state.data_retriever is None:
-            st.session_state.data_retriever = DataRetriever()
+        get_data_retriever()
         return True
     except Exception as e:
         st.error(f"Failed to connect to database: {str(e)}")
         return False
 
+@st.cache_data(ttl=300, show_spinner=False, max_entries=8)
+def load_manufacturing_data(_data_retriever, start_date, end_date):
+    """Manufacturing rows for a date range (cached per range, so repeated loads skip MongoDB)"""
+    return _data_retriever.get_manufacturing_data(start_date, end_date)
+
 # Main content
 st.title("🔧 Manufacturing & Quality Control")
 st.markdown("##### Production monitoring, defect rates, and quality metrics")
@@ -229,11 +234,11 @@ with st.sidebar:
                         start_date = end_date - timedelta(days=30)
                     
                     # Fetch Manufacturing data from 'Manufacturing' collection
-                    manufacturing_df = st.session_state.data_retriever.get_manufacturing_data(start_date, end_date)
+                    manufacturing_df = load_manufacturing_data(get_data_retriever(), start_date, end_date)
                     
                     if not manufacturing_df.empty:
                         # Analyze manufacturing data
-                        results = st.session_state.ai_engine.analyze_quality(manufacturing_df)
+                        results = ai_engine.analyze_quality(manufacturing_df)
                         
                         st.session_state.manufacturing_data = {
                             'df': manufacturing_df,
@@ -276,7 +281,7 @@ if st.session_state.manufacturing_data_loaded and st.session_state.manufacturing
     
     # Recalculate results for filtered data
     if line_filter or sku_filter:
-        results = st.session_state.ai_engine.analyze_quality(filtered_df)
+        results = ai_engine.analyze_quality(filtered_df)
     
     # KPI Row
     st.markdown("### 📈 Key Quality Metrics")
@@ -311,7 +316,7 @@ if st.session_state.manufacturing_data_loaded and st.session_state.manufacturing
     
     # Defect Rate Trend
     st.markdown("### 📊 Defect Rate Trend Over Time")
-    if not results['defect_trend'].empty:
+    if results['defect_trend'] is not None:
         fig = px.line(
             results['defect_trend'],
             x='Date',
@@ -342,11 +347,11 @@ if st.session_state.manufacturing_data_loaded and st.session_state.manufacturing
     
     with col1:
         st.markdown("### 🏭 Production Line Performance")
-        if not results['line_performance'].empty:
-            # Color code by defect rate
-            line_perf = results['line_performance'].copy()
-            line_perf['Status'] = line_perf['Defect_Rate'].apply(
-                lambda x: 'Critical' if x > 10 else ('Warning' if x > 5 else 'Good')
+        if results['line_performance'] is not None:
+            # Color code by defect rate (one vectorized pass; assign leaves the cached result untouched)
+            rate = results['line_performance']['Defect_Rate'].to_numpy()
+            line_perf = results['line_performance'].assign(
+                Status=np.where(rate > 10, 'Critical', np.where(rate > 5, 'Warning', 'Good'))
             )
             
             fig = px.bar(
@@ -374,7 +379,7 @@ if st.session_state.manufacturing_data_loaded and st.session_state.manufacturing
     
     with col2:
         st.markdown("### 📊 Production Volume by Line")
-        if not results['line_performance'].empty:
+        if results['line_performance'] is not None:
             fig = px.pie(
                 results['line_performance'],
                 values='Quantity_Produced',
@@ -398,9 +403,9 @@ if st.session_state.manufacturing_data_loaded and st.session_state.manufacturing
     if results['anomalies']:
         st.warning(f"**{len(results['anomalies'])} production lines** have defect rates above 5% threshold")
         
-        # Show anomalous lines
-        anomaly_df = results['line_performance'][results['line_performance']['Line_ID'].isin(results['anomalies'])].copy()
-        anomaly_df = anomaly_df.sort_values('Defect_Rate', ascending=False)
+        # Show anomalous lines (line_performance is already ordered worst-first, so the
+        # filtered rows need neither a copy nor a re-sort)
+        anomaly_df = results['line_performance'][results['line_performance']['Line_ID'].isin(results['anomalies'])]
         
         col1, col2 = st.columns([2, 1])
         with col1:
@@ -423,7 +428,7 @@ if st.session_state.manufacturing_data_loaded and st.session_state.manufacturing
     st.markdown("---")
     st.markdown("### 📋 Line Performance Summary")
     
-    if not results['line_performance'].empty:
+    if results['line_performance'] is not None:
         display_df = results['line_performance'].copy()
         display_df['Defect_Rate'] = display_df['Defect_Rate'].apply(lambda x: f"{x:.2f}%")
         display_df['Quantity_Produced'] = display_df['Quantity_Produced'].apply(lambda x: f"{x:,.0f}")
@@ -435,9 +440,10 @@ if st.session_state.manufacturing_data_loaded and st.session_state.manufacturing
         st.markdown("---")
         st.markdown("### 🗓️ Daily Production Heatmap")
         
-        heatmap_df = filtered_df.copy()
-        heatmap_df['Date'] = pd.to_datetime(heatmap_df['timestamp']).dt.date
-        heatmap_pivot = heatmap_df.groupby(['Date', 'Line_ID'])['Quantity_Produced'].sum().reset_index()
+        days = pd.Series(day_bucket(filtered_df['timestamp']), index=filtered_df.index, name='Date')
+        heatmap_pivot = filtered_df.groupby([days, 'Line_ID'], sort=False, observed=True, as_index=False).agg(
+            Quantity_Produced=('Quantity_Produced', 'sum')
+        )
         heatmap_pivot = heatmap_pivot.pivot(index='Line_ID', columns='Date', values='Quantity_Produced').fillna(0)
         
         fig = px.imshow(
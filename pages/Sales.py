@@ -8,8 +8,8 @@ import pandas as pd
 import plotly.express as px
 import plotly.graph_objects as go
 from datetime import datetime, timedelta
-from core_analysis.data_retriever import DataRetriever
-from core_analysis.ai_engine import AIEngine
+from core_analysis.data_retriever import get_data_retriever
+from core_analysis.ai_engine import get_ai_engine
 
 # Page configuration
 st.set_page_config(
@@ -141,11 +141,10 @@ st.markdown("""
 </style>
 """, unsafe_allow_html=True)
 
+# Shared engine (cached process-wide)
+ai_engine = get_ai_engine()
+
 # Initialize session state
-if 'data_retriever' not in st.session_state:
-    st.session_state.data_retriever = None
-if 'ai_engine' not in st.session_state:
-    st.session_state.ai_engine = AIEngine()
 if 'sales_data_loaded' not in st.session_state:
     st.session_state.sales_data_loaded = False
 if 'sales_data' not in st.session_state:
@@ -154,13 +153,17 @@ if 'sales_data' not in st.session_state:
 def initialize_connections():
     """Initialize database connections"""
     try:
-        if st.session_state.data_retriever is None:
-            st.session_state.data_retriever = DataRetriever()
+        get_data_retriever()
         return True
     except Exception as e:
         st.error(f"Failed to connect to database: {str(e)}")
         return False
 
+@st.cache_data(ttl=300, show_spinner=False, max_entries=8)
+def load_sales_data(_data_retriever, start_date, end_date):
+    """Sales rows for a date range (cached per range, so repeated loads skip MongoDB)"""
+    return _data_retriever.get_sales_data(start_date, end_date)
+
 # Main content
 st.title("💰 Sales Analytics")
 st.markdown("##### Revenue trends, top products, and profit analysis")
@@ -197,11 +200,11 @@ with st.sidebar:
                         start_date = end_date - timedelta(days=30)
                     
                     # Fetch Sales data from 'Sales' collection
-                    sales_df = st.session_state.data_retriever.get_sales_data(start_date, end_date)
+                    sales_df = load_sales_data(get_data_retriever(), start_date, end_date)
                     
                     if not sales_df.empty:
                         # Analyze sales data
-                        results = st.session_state.ai_engine.analyze_sales(sales_df)
+                        results = ai_engine.analyze_sales(sales_df)
                         
                         st.session_state.sales_data = {
                             'df': sales_df,
@@ -238,7 +241,7 @@ if st.session_state.sales_data_loaded and st.session_state.sales_data:
     if sku_filter:
         filtered_df = filtered_df[filtered_df['SKU'].isin(sku_filter)]
         # Recalculate results for filtered data
-        results = st.session_state.ai_engine.analyze_sales(filtered_df)
+        results = ai_engine.analyze_sales(filtered_df)
     
     # KPI Row
     st.markdown("### 📈 Key Sales Metrics")
@@ -261,7 +264,7 @@ if st.session_state.sales_data_loaded and st.session_state.sales_data:
     
     # Revenue Trend Chart
     st.markdown("### 📊 Revenue Trend Over Time")
-    if not results['revenue_trend'].empty:
+    if results['revenue_trend'] is not None:
         fig = px.area(
             results['revenue_trend'],
             x='Date',
@@ -289,7 +292,7 @@ if st.session_state.sales_data_loaded and st.session_state.sales_data:
     
     with col1:
         st.markdown("#### 🏆 Top 10 Products by Revenue")
-        if not results['top_products'].empty:
+        if results['top_products'] is not None:
             top_10 = results['top_products'].head(10)
             fig = px.bar(
                 top_10,
@@ -316,7 +319,7 @@ if st.session_state.sales_data_loaded and st.session_state.sales_data:
     
     with col2:
         st.markdown("#### 💵 Daily Profit Trend")
-        if not results['revenue_trend'].empty:
+        if results['revenue_trend'] is not None:
             fig = px.line(
                 results['revenue_trend'],
                 x='Date',
@@ -343,7 +346,7 @@ if st.session_state.sales_data_loaded and st.session_state.sales_data:
     st.markdown("---")
     st.markdown("### 📊 Revenue Distribution by Product")
     
-    if not results['top_products'].empty:
+    if results['top_products'] is not None:
         col1, col2 = st.columns(2)
         
         with col1:
@@ -5,11 +5,13 @@ Connected to 'Testing' MongoDB collection
 
 import streamlit as st
 import pandas as pd
+import numpy as np
 import plotly.express as px
 import plotly.graph_objects as go
 from datetime import datetime, timedelta
-from core_analysis.data_retriever import DataRetriever
-from core_analysis.ai_engine import AIEngine
+from core_analysis.data_retriever import get_data_retriever
+from core_analysis.ai_engine import get_ai_engine
+from core_analysis.fastprep import daily_sums, group_sums, safe_ratio, status_mask
 
 # Page configuration
 st.set_page_config(
@@ -170,11 +172,10 @@ st.markdown("""
 </style>
 """, unsafe_allow_html=True)
 
+# Shared engine (cached process-wide)
+ai_engine = get_ai_engine()
+
 # Initialize session state
-if 'data_retriever' not in st.session_state:
-    st.session_state.data_retriever = None
-if 'ai_engine' not in st.session_state:
-    st.session_state.ai_engine = AIEngine()
 if 'testing_data_loaded' not in st.session_state:
     st.session_state.testing_data_loaded = False
 if 'testing_data' not in st.session_state:
@@ -183,13 +184,17 @@ if 'testing_data' not in st.session_state:
 def initialize_connections():
     """Initialize database connections"""
     try:
-        if st.session_state.data_retriever is None:
-            st.session_state.data_retriever = DataRetriever()
+        get_data_retriever()
         return True
     except Exception as e:
         st.error(f"Failed to connect to database: {str(e)}")
         return False
 
+@st.cache_data(ttl=300, show_spinner=False, max_entries=8)
+def load_testing_data(_data_retriever, start_date, end_date):
+    """Testing rows for a date range (cached per range, so repeated loads skip MongoDB)"""
+    return _data_retriever.get_testing_data(start_date, end_date)
+
 # Main content
 st.title("🧪 Testing & Quality Assurance")
 st.markdown("##### Test results, pass rates, and quality validation")
@@ -234,11 +239,11 @@ with st.sidebar:
                         start_date = end_date - timedelta(days=30)
                     
                     # Fetch Testing data from 'Testing' collection
-                    testing_df = st.session_state.data_retriever.get_testing_data(start_date, end_date)
+                    testing_df = load_testing_data(get_data_retriever(), start_date, end_date)
                     
                     if not testing_df.empty:
                         # Analyze testing data
-                        results = st.session_state.ai_engine.analyze_testing(testing_df)
+                        results = ai_engine.analyze_testing(testing_df)
                         
                         st.session_state.testing_data = {
                             'df': testing_df,
@@ -276,11 +281,11 @@ if st.session_state.testing_data_loaded and st.session_state.testing_data:
         filtered_df = filtered_df[filtered_df['Batch_ID'].isin(batch_filter)]
     
     if status_filter != "All" and 'Pass_Fail_Status' in filtered_df.columns:
-        filtered_df = filtered_df[filtered_df['Pass_Fail_Status'].str.lower() == status_filter.lower()]
+        filtered_df = filtered_df[status_mask(filtered_df['Pass_Fail_Status'], status_filter.lower())]
     
     # Recalculate results for filtered data
     if batch_filter or status_filter != "All":
-        results = st.session_state.ai_engine.analyze_testing(filtered_df)
+        results = ai_engine.analyze_testing(filtered_df)
     
     # KPI Row
     st.markdown("### 📈 Key Testing Metrics")
@@ -378,14 +383,10 @@ if st.session_state.testing_data_loaded and st.session_state.testing_data:
         st.markdown("---")
         st.markdown("### 📊 Daily Pass Rate Trend")
         
-        trend_df = filtered_df.copy()
-        trend_df['Date'] = pd.to_datetime(trend_df['timestamp']).dt.date
-        
-        daily_stats = trend_df.groupby('Date').agg({
-            'Pass_Fail_Status': lambda x: (x.str.lower() == 'passed').sum() / len(x) * 100
-        }).reset_index()
-        daily_stats.columns = ['Date', 'Pass_Rate']
-        daily_stats = daily_stats.sort_values('Date')
+        # Passed and row counts per day in one pass over the day ids (no hashed groupby)
+        passed = status_mask(filtered_df['Pass_Fail_Status'], 'passed')
+        daily_stats = daily_sums(filtered_df['timestamp'], {'Passed': passed, 'Rows': np.ones(len(passed), dtype=bool)})
+        daily_stats['Pass_Rate'] = safe_ratio(daily_stats.pop('Passed'), daily_stats.pop('Rows'), 100.0)
         
         fig = px.line(
             daily_stats,
@@ -414,14 +415,20 @@ if st.session_state.testing_data_loaded and st.session_state.testing_data:
         st.markdown("---")
         st.markdown("### 🏭 Batch Performance Analysis")
         
-        batch_stats = filtered_df.groupby('Batch_ID').agg({
-            'Pass_Fail_Status': [
-                'count',
-                lambda x: (x.str.lower() == 'passed').sum(),
-                lambda x: (x.str.lower() == 'passed').sum() / len(x) * 100
-            ]
-        }).reset_index()
-        batch_stats.columns = ['Batch_ID', 'Total_Tests', 'Passed', 'Pass_Rate']
+        # Pass flags computed once, then per-batch sums over the batch codes (no hashed groupby)
+        status = filtered_df['Pass_Fail_Status']
+        passed = status_mask(status, 'passed')
+        batches, batch_sums = group_sums(filtered_df['Batch_ID'], {
+            'Total_Tests': status.notna(),
+            'Passed': passed,
+            'Rows': np.ones(len(passed), dtype=bool)
+        })
+        batch_stats = pd.DataFrame({
+            'Batch_ID': batches,
+            'Total_Tests': batch_sums['Total_Tests'],
+            'Passed': batch_sums['Passed'],
+            'Pass_Rate': safe_ratio(batch_sums['Passed'], batch_sums['Rows'], 100.0)
+        })
         batch_stats = batch_stats.sort_values('Pass_Rate', ascending=True)
         
         col1, col2 = st.columns(2)
@@ -468,7 +475,7 @@ if st.session_state.testing_data_loaded and st.session_state.testing_data:
     st.markdown("### ⚠️ Failed Tests Analysis")
     
     if results['failed_tests'] > 0:
-        failed_df = filtered_df[filtered_df['Pass_Fail_Status'].str.lower() == 'failed']
+        failed_df = filtered_df[status_mask(filtered_df['Pass_Fail_Status'], 'failed')]
         
         col1, col2 = st.columns([2, 1])
         